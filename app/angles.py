@@ -0,0 +1,170 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+from sqlalchemy import update
+from sqlmodel import Session
+
+from .dedup import STOPWORDS
+from .models import CategoryAngle, Post
+
+# Local TF-IDF + spherical k-means over a category's posts. Gives every category
+# a handful of labelled sub-angles without any LLM call.
+MAX_ANGLES = 6
+MIN_POSTS_PER_ANGLE = 3
+MAX_FEATURES = 2000
+LABEL_TERMS = 3
+KMEANS_ITERATIONS = 25
+SEED = 7
+
+WORD_RE = re.compile(r"[a-z][a-z0-9']+")
+# Words that show up in every discussion and say nothing about the angle
+FILLER = frozenset(
+    "about after any anyone advice all also am been best but did does dont don't else "
+    "even ever feel good got help here just know like looking make more most need new "
+    "not now one only other out over people really still than thanks them then there "
+    "these they thing think time too want way we were while year years".split()
+)
+
+
+class Angle(NamedTuple):
+    label: str
+    terms: List[str]
+    members: List[int]  # indexes into the input documents, best match first
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        w for w in WORD_RE.findall((text or "").lower())
+        if w not in STOPWORDS and w not in FILLER
+    ]
+
+
+def tfidf(docs: Sequence[str]):
+    """
+    L2-normalised TF-IDF rows plus the vocabulary. Terms seen in only one
+    document can't link posts together, so they're dropped.
+    """
+    counts = [Counter(tokenize(d)) for d in docs]
+    df = Counter(term for c in counts for term in c)
+    vocab = [t for t, n in df.most_common(MAX_FEATURES) if n >= 2]
+    if not vocab:
+        return np.zeros((len(docs), 0)), []
+    column = {t: i for i, t in enumerate(vocab)}
+
+    rows, cols, values = [], [], []
+    for r, c in enumerate(counts):
+        for term, n in c.items():
+            j = column.get(term)
+            if j is not None:
+                rows.append(r)
+                cols.append(j)
+                values.append(1.0 + math.log(n))
+    matrix = np.zeros((len(docs), len(vocab)))
+    matrix[rows, cols] = values
+
+    idf = np.log((1 + len(docs)) / (1 + np.array([df[t] for t in vocab], dtype=float))) + 1.0
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix, vocab
+
+
+def _kmeans(matrix: np.ndarray, k: int) -> np.ndarray:
+    """
+    Spherical k-means (cosine similarity) with k-means++ seeding; returns labels.
+    """
+    rng = np.random.default_rng(SEED)
+    n = matrix.shape[0]
+    centers = [matrix[rng.integers(n)]]
+    for _ in range(1, k):
+        distance = 1.0 - np.max(matrix @ np.array(centers).T, axis=1)
+        distance = np.clip(distance, 0.0, None)
+        total = distance.sum()
+        if total <= 0:
+            break
+        centers.append(matrix[rng.choice(n, p=distance / total)])
+    centroids = np.array(centers)
+
+    labels = None
+    for _ in range(KMEANS_ITERATIONS):
+        new_labels = np.argmax(matrix @ centroids.T, axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(len(centroids)):
+            members = matrix[labels == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                centroids[c] = centroid / norm if norm else centroid
+    return labels
+
+
+def cluster_angles(docs: Sequence[str], max_angles: int = MAX_ANGLES) -> List[Angle]:
+    """
+    Groups documents into at most `max_angles` sub-themes labelled by their top
+    terms, largest first. Documents with no shared vocabulary are left out.
+    """
+    matrix, vocab = tfidf(docs)
+    if not vocab:
+        return []
+    has_terms = np.flatnonzero(matrix.any(axis=1))
+    if len(has_terms) < MIN_POSTS_PER_ANGLE:
+        return []
+    matrix = matrix[has_terms]
+
+    k = max(1, min(max_angles, round(math.sqrt(len(has_terms)))))
+    labels = _kmeans(matrix, k)
+
+    angles = []
+    for c in range(k):
+        idx = np.flatnonzero(labels == c)
+        if len(idx) < MIN_POSTS_PER_ANGLE:
+            continue
+        centroid = matrix[idx].mean(axis=0)
+        terms = [vocab[j] for j in np.argsort(centroid)[::-1][:LABEL_TERMS] if centroid[j] > 0]
+        order = idx[np.argsort(matrix[idx] @ centroid)[::-1]]
+        angles.append(
+            Angle(label=" · ".join(terms), terms=terms, members=[int(has_terms[i]) for i in order])
+        )
+    angles.sort(key=lambda a: len(a.members), reverse=True)
+    return angles
+
+
+def build_category_angles(
+    session: Session,
+    category: str,
+    posts: List[Post],
+    comments: Dict[int, List[str]] | None = None,
+) -> List[CategoryAngle]:
+    """
+    Clusters `posts` (title plus any fetched comments) into CategoryAngle rows
+    and points each member post at its angle.
+    """
+    comments = comments or {}
+    # Posts kept from earlier runs (tweets, duplicates) may point at angles
+    # that were replaced; only this run's members get one again
+    session.exec(update(Post).where(Post.category == category).values(angle_id=None))
+    docs = [" ".join([p.title, *comments.get(p.id, [])]) for p in posts]
+    rows = []
+    for position, angle in enumerate(cluster_angles(docs)):
+        lead = posts[angle.members[0]]
+        row = CategoryAngle(
+            category=category,
+            label=angle.label,
+            terms=",".join(angle.terms),
+            size=len(angle.members),
+            position=position,
+            lead_url=lead.url,
+            lead_title=lead.title,
+        )
+        session.add(row)
+        session.flush()
+        for i in angle.members:
+            posts[i].angle_id = row.id
+            session.add(posts[i])
+        rows.append(row)
+    return rows
@@ -0,0 +1,279 @@
+"""
+JSON API over what the dashboard shows: categories, conversations, posts.
+
+Every list is keyset-paginated (pass the returned `next` back as `after`),
+takes `fields=a,b,c` to select columns, and carries an ETag tied to the
+ingest generation, so clients can poll cheaply with If-None-Match.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response
+from sqlalchemy import and_, func, literal_column, or_
+from sqlmodel import Session, select
+
+from .auth import get_current_user
+from .db import get_session
+from .digests import digest_url
+from .models import (
+    CategorySummary,
+    ContentVersion,
+    ConversationSummary,
+    IngestJob,
+    IngestRun,
+    MaintenanceRun,
+    Post,
+    TopicDigest,
+)
+from .records import dumps
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+CONVERSATION_FIELDS = {
+    "id": ConversationSummary.id,
+    "category": ConversationSummary.category,
+    "position": ConversationSummary.position,
+    "summary": ConversationSummary.summary,
+    "url": ConversationSummary.post_url,
+    "cluster_key": ConversationSummary.cluster_key,
+    "stale": ConversationSummary.stale,
+    "created_at": ConversationSummary.created_at,
+}
+POST_FIELDS = {
+    "id": Post.id,
+    "source": Post.source,
+    "source_id": Post.source_id,
+    "category": Post.category,
+    "title": Post.title,
+    "url": Post.url,
+    "author": Post.author,
+    "created_utc": Post.created_utc,
+    "score": Post.score,
+    "num_comments": Post.num_comments,
+    "heat_score": Post.heat_score,
+    "duplicate_of": Post.duplicate_of,
+    "angle_id": Post.angle_id,
+    "stale": Post.stale,
+}
+CATEGORY_FIELDS = ("name", "count", "summary", "summary_stale", "summary_updated_at", "digest")
+
+router = APIRouter(prefix="/api")
+
+
+class ApiError(Exception):
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.message = message
+
+
+def json_response(payload, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    return Response(dumps(payload), status_code=status_code, media_type="application/json", headers=headers)
+
+
+async def api_error_handler(request: Request, exc: ApiError) -> Response:
+    return json_response({"error": exc.message}, status_code=exc.status_code)
+
+
+def require_user(request: Request, session: Session = Depends(get_session)):
+    user = get_current_user(request, session)
+    if not user:
+        raise ApiError(401, "login required")
+    return user
+
+
+def ingest_generation(session: Session) -> str:
+    """
+    Changes whenever stored results can have changed: a topic queued (new job)
+    or cleared (content version), an ingest finished, or a maintenance pass.
+    """
+    run_id, finished = session.exec(select(func.max(IngestRun.id), func.max(IngestRun.finished_at))).one()
+    job_id = session.exec(select(func.max(IngestJob.id))).one()
+    maintenance_id = session.exec(select(func.max(MaintenanceRun.id))).one()
+    content_version = session.exec(select(func.max(ContentVersion.version))).one()
+    stamp = int(finished.timestamp()) if finished else 0
+    return f"{run_id or 0}.{stamp}.{job_id or 0}.{maintenance_id or 0}.{content_version or 0}"
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    return etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+
+
+def page_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def select_fields(fields: Optional[str], available) -> List[str]:
+    if not fields:
+        return list(available)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in available]
+    if unknown:
+        raise ApiError(400, f"unknown fields: {', '.join(unknown)}; available: {', '.join(available)}")
+    return wanted
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def decode_cursor(after: Optional[str], kind) -> Optional[Tuple]:
+    """
+    Cursors are "<sort value>:<id>", like the search cursors.
+    """
+    if not after:
+        return None
+    try:
+        value, id_ = after.rsplit(":", 1)
+        return kind(value), int(id_)
+    except ValueError:
+        raise ApiError(400, "bad cursor")
+
+
+def cached(request: Request, session: Session, build) -> Response:
+    generation = ingest_generation(session)
+    etag = f'W/"{generation}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    payload = build()
+    payload["generation"] = generation
+    return json_response(payload, headers=headers)
+
+
+@router.get("/categories")
+def api_categories(
+    request: Request,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session),
+    user=Depends(require_user),
+):
+    """
+    Categories with post counts, by name.
+    """
+    wanted = select_fields(fields, CATEGORY_FIELDS)
+    limit = page_limit(limit)
+
+    def build() -> Dict:
+        query = select(Post.category, func.count(Post.id)).group_by(Post.category).order_by(Post.category)
+        if after:
+            query = query.where(Post.category > after)
+        rows = session.exec(query.limit(limit + 1)).all()
+        page = rows[:limit]
+        names = [name for name, _ in page]
+
+        summaries, digests = {}, {}
+        if {"summary", "summary_stale", "summary_updated_at"} & set(wanted):
+            summaries = {
+                s.category: s
+                for s in session.exec(select(CategorySummary).where(CategorySummary.category.in_(names))).all()
+            }
+        if "digest" in wanted:
+            digests = {
+                d.topic: digest_url(d.topic, d.version, "json")
+                for d in session.exec(select(TopicDigest).where(TopicDigest.topic.in_(names))).all()
+            }
+
+        items = []
+        for name, count in page:
+            summary = summaries.get(name)
+            row = {
+                "name": name,
+                "count": count,
+                "summary": summary.summary if summary else None,
+                "summary_stale": summary.stale if summary else None,
+                "summary_updated_at": _jsonable(summary.updated_at) if summary else None,
+                "digest": digests.get(name),
+            }
+            items.append({f: row[f] for f in wanted})
+        return {"items": items, "next": names[-1] if len(rows) > limit else None}
+
+    return cached(request, session, build)
+
+
+@router.get("/categories/{category}/conversations")
+def api_conversations(
+    request: Request,
+    category: str,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session),
+    user=Depends(require_user),
+):
+    """
+    A category's conversation summaries, in dashboard order (hottest first).
+    """
+    wanted = select_fields(fields, CONVERSATION_FIELDS)
+    cursor = decode_cursor(after, int)
+    limit = page_limit(limit)
+
+    def build() -> Dict:
+        # The sort keys ride along so the cursor can be built whatever was selected
+        columns = [CONVERSATION_FIELDS[f] for f in wanted]
+        query = (
+            select(ConversationSummary.position, ConversationSummary.id, *columns)
+            .where(ConversationSummary.category == category)
+            .order_by(ConversationSummary.position, ConversationSummary.id)
+        )
+        if cursor:
+            position, id_ = cursor
+            query = query.where(
+                or_(
+                    ConversationSummary.position > position,
+                    and_(ConversationSummary.position == position, ConversationSummary.id > id_),
+                )
+            )
+        rows = session.exec(query.limit(limit + 1)).all()
+        items = [dict(zip(wanted, map(_jsonable, row[2:]))) for row in rows[:limit]]
+        next_cursor = f"{rows[limit - 1][0]}:{rows[limit - 1][1]}" if len(rows) > limit else None
+        return {"items": items, "next": next_cursor}
+
+    return cached(request, session, build)
+
+
+@router.get("/posts")
+def api_posts(
+    request: Request,
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+    include_duplicates: bool = False,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session),
+    user=Depends(require_user),
+):
+    """
+    Posts, hottest first; near-duplicates are left out unless asked for.
+    """
+    wanted = select_fields(fields, POST_FIELDS)
+    cursor = decode_cursor(after, float)
+    limit = page_limit(limit)
+
+    def build() -> Dict:
+        columns = [POST_FIELDS[f] for f in wanted]
+        query = select(Post.heat_score, Post.id, *columns).order_by(Post.heat_score.desc(), Post.id.desc())
+        if category:
+            query = query.where(Post.category == category)
+        if source:
+            query = query.where(Post.source == source)
+        if not include_duplicates:
+            # Unary + keeps SQLite off ix_post_duplicate_of, which it would otherwise
+            # pick for the IS NULL and then sort every representative; walking
+            # ix_post_heat / ix_post_category_heat in order stops after one page
+            query = query.where(literal_column(f"+{Post.__tablename__}.duplicate_of").is_(None))
+        if cursor:
+            heat, id_ = cursor
+            query = query.where(
+                or_(Post.heat_score < heat, and_(Post.heat_score == heat, Post.id < id_))
+            )
+        rows = session.exec(query.limit(limit + 1)).all()
+        items = [dict(zip(wanted, map(_jsonable, row[2:]))) for row in rows[:limit]]
+        next_cursor = f"{rows[limit - 1][0]!r}:{rows[limit - 1][1]}" if len(rows) > limit else None
+        return {"items": items, "next": next_cursor}
+
+    return cached(request, session, build)
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream whose breaker is open.
+    """
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit open; retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for one upstream.
+
+    Closed: calls go through and outcomes fill a sliding window. Once the window
+    holds at least `min_calls` outcomes and the failure rate reaches
+    `failure_rate`, the breaker opens. Open: calls fail fast with
+    CircuitOpenError for `open_seconds`. Half-open: one probe call is let
+    through; success closes the breaker, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 4,
+        window: int = 10,
+        open_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._outcomes: deque = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def is_open(self) -> bool:
+        """
+        True while calls would fail fast (half-open counts as closed here).
+        """
+        return self.state == OPEN
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            retry_in = self.open_seconds - (time.monotonic() - self._opened_at)
+            if self._state == OPEN and retry_in > 0:
+                raise CircuitOpenError(self.name, retry_in)
+            # Cool-down over: let exactly one probe through
+            if self._probing:
+                raise CircuitOpenError(self.name, max(retry_in, 0.0))
+            self._state = HALF_OPEN
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+            self._probing = False
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._probing = False
+            if self._state == HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._trip()
+
+    def _release_probe(self) -> None:
+        with self._lock:
+            self._probing = False
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def call(self, fn: Callable, *args, is_failure: Optional[Callable] = None, **kwargs):
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled, not failed: just free the probe slot
+            self._release_probe()
+            raise
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    async def call_async(self, fn: Callable, *args, is_failure: Optional[Callable] = None, **kwargs):
+        self.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled, not failed: just free the probe slot
+            self._release_probe()
+            raise
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+
+def upstream_failed(response) -> bool:
+    """
+    HTTP responses that mean the upstream is struggling (not that we asked wrong).
+    """
+    return response.status_code >= 500 or response.status_code == 429
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {
+    "reddit": CircuitBreaker("reddit"),
+    "x": CircuitBreaker("x"),
+    "openai": CircuitBreaker("openai", open_seconds=60.0),
+}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    return BREAKERS[name]
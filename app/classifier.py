@@ -0,0 +1,125 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from .topics import TOPIC_CHOICES, TOPIC_SYNONYMS
+
+# Words shorter than this are usually acronyms ("ai", "hr", "vc"); they don't take a plural s.
+MIN_PLURAL_LEN = 3
+SEPARATOR = r"[\s\-]+"
+SPLIT_RE = re.compile(SEPARATOR)
+_END = ""
+
+
+def _canonical(term: str) -> str:
+    # "machine-learning"/"Machine learning" share one key; the words themselves
+    # are left alone ("mars" is not a plural)
+    return " ".join(SPLIT_RE.split(term.strip().lower()))
+
+
+def _takes_plural(term: str) -> bool:
+    last = term.split(" ")[-1]
+    return len(last) >= MIN_PLURAL_LEN and not last.endswith("s")
+
+
+def _trie_pattern(node: Dict) -> str:
+    """
+    Turns a character trie into a regex where each position is matched by
+    walking the trie, instead of trying every term in turn.
+    """
+    alternatives = [
+        (SEPARATOR if ch == " " else re.escape(ch)) + _trie_pattern(child)
+        for ch, child in sorted(node.items())
+        if ch != _END
+    ]
+    plural = "s?" if node.get(_END) else ""
+    if not alternatives:
+        return plural
+    body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    if _END in node:
+        # Greedy: prefer the longer term, fall back to the one ending here
+        return f"(?:{body})?{plural}"
+    return body
+
+
+class TopicClassifier:
+    """
+    Assigns texts to every matching topic in a single regex pass.
+
+    Topic names and synonyms are compiled into one trie-shaped regex inside a
+    lookahead, so overlapping terms ("personal finance" and "finance") both match.
+    """
+
+    def __init__(self, topics: Iterable[str], synonyms: Mapping[str, Sequence[str]] = TOPIC_SYNONYMS):
+        self.topics = [t.strip().lower() for t in topics if t.strip()]
+        owners: Dict[str, List[str]] = {}
+        for topic in self.topics:
+            for term in [topic, *synonyms.get(topic, ())]:
+                topics_for_term = owners.setdefault(_canonical(term), [])
+                if topic not in topics_for_term:
+                    topics_for_term.append(topic)
+
+        # Only one term can match at a position, so a longer term also carries
+        # the topics of the shorter terms it starts with ("stock market" is about
+        # stocks too).
+        for term, topics_for_term in owners.items():
+            words = term.split(" ")
+            for n in range(1, len(words)):
+                for topic in owners.get(" ".join(words[:n]), ()):
+                    if topic not in topics_for_term:
+                        topics_for_term.append(topic)
+        # A term's plural that is also a term of its own ("recipes") is still the
+        # plural, so it carries the singular's topics as well
+        for term, topics_for_term in owners.items():
+            if term.endswith("s") and _takes_plural(term[:-1]):
+                for topic in owners.get(term[:-1], ()):
+                    if topic not in topics_for_term:
+                        topics_for_term.append(topic)
+        self._owners: Dict[str, Tuple[str, ...]] = {t: tuple(o) for t, o in owners.items()}
+
+        trie: Dict = {}
+        for term in owners:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            # Terms match as written, plus an optional plural s
+            node[_END] = _takes_plural(term)
+        # Lookarounds rather than \b, which never matches next to a term's own
+        # punctuation ("c++", ".net")
+        self._pattern = re.compile(rf"(?<!\w)(?=({_trie_pattern(trie)})(?!\w))", re.IGNORECASE) if trie else None
+
+    def classify(self, text: str) -> List[str]:
+        """
+        Topics mentioned in `text`, in order of first mention.
+        """
+        if not self._pattern or not text:
+            return []
+        found: Dict[str, None] = {}
+        owners = self._owners
+        for m in self._pattern.finditer(text):
+            key = _canonical(m.group(1))
+            # The text as written first; only then as the plural of a term
+            topics = owners.get(key) or (owners.get(key[:-1], ()) if key.endswith("s") else ())
+            for topic in topics:
+                found.setdefault(topic, None)
+        return list(found)
+
+    def classify_many(self, texts: Iterable[str]) -> List[List[str]]:
+        classify = self.classify
+        return [classify(t) for t in texts]
+
+
+DEFAULT_CLASSIFIER = TopicClassifier(TOPIC_CHOICES)
+
+
+@lru_cache(maxsize=64)
+def _cached_classifier(topics: Tuple[str, ...]) -> TopicClassifier:
+    return TopicClassifier(topics)
+
+
+def classifier_for(topics: Iterable[str]) -> TopicClassifier:
+    """
+    Classifier restricted to `topics` (which may include free-form topics not in
+    TOPIC_CHOICES); compiled once per distinct topic set.
+    """
+    return _cached_classifier(tuple(sorted({t.strip().lower() for t in topics if t.strip()})))
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from .breaker import CircuitOpenError
+from .ingest_reddit import fetch_reddit_comments
+from .models import CommentCache, Post
+from .records import CommentRecord, dumps, loads
+from .settings import settings
+
+
+def is_fresh(entry: CommentCache, num_comments: int) -> bool:
+    """
+    Cached comments stay valid until the post has gained `comment_refetch_delta`
+    comments since the fetch or the entry is older than the TTL.
+    """
+    if num_comments - entry.num_comments >= settings.comment_refetch_delta:
+        return False
+    return datetime.utcnow() - entry.fetched_at < timedelta(hours=settings.comment_cache_ttl_hours)
+
+
+async def get_post_comments(session: Session, post: Post, limit: int) -> List[CommentRecord]:
+    """
+    Top-level comments for a Reddit post, from the cache when the post hasn't
+    moved much since we last fetched. The caller commits.
+    """
+    entry = session.exec(select(CommentCache).where(CommentCache.post_id == post.source_id)).first()
+    cached = [CommentRecord(body, score) for body, score in loads(entry.comments)] if entry else []
+    if entry and is_fresh(entry, post.num_comments):
+        return cached
+
+    try:
+        comments = await fetch_reddit_comments(post.source_id, limit=limit)
+    except (httpx.HTTPError, CircuitOpenError):
+        # Reddit is struggling; stale comments beat none
+        return cached
+    if not comments and post.num_comments:
+        # Most likely a failed request; keep whatever we had
+        return cached
+
+    # Workers on other topics may fetch the same post; upsert so the second
+    # writer updates the row instead of hitting the unique post_id
+    values = {
+        "num_comments": post.num_comments,
+        "comments": dumps([[c.body, c.score] for c in comments]),
+        "fetched_at": datetime.utcnow(),
+    }
+    session.exec(
+        insert(CommentCache)
+        .values(post_id=post.source_id, **values)
+        .on_conflict_do_update(index_elements=[CommentCache.post_id], set_=values)
+    )
+    return comments
@@ -0,0 +1,111 @@
+"""
+Response compression: brotli when the client accepts it and the package is
+installed, gzip otherwise. Responses that already carry a Content-Encoding
+(precompressed digests) pass through untouched.
+"""
+import io
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # optional, like orjson
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Below this, compression costs more than the bytes it saves
+MINIMUM_SIZE = 500
+GZIP_LEVEL = 6
+# Dynamic pages: fast settings; static snapshots are compressed harder up front
+BROTLI_QUALITY = 5
+
+
+class _BrotliFile:
+    """
+    Just enough of gzip.GzipFile for GZipResponder to drive a brotli compressor.
+    """
+
+    def __init__(self, fileobj, quality: int):
+        self.fileobj = fileobj
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def write(self, data: bytes) -> None:
+        self.fileobj.write(self._compressor.process(data))
+        # Emit what we have so streamed chunks aren't held back
+        self.fileobj.write(self._compressor.flush())
+
+    def close(self) -> None:
+        if self._compressor is not None:
+            self.fileobj.write(self._compressor.finish())
+            self._compressor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BrotliResponder(GZipResponder):
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = BROTLI_QUALITY) -> None:
+        super().__init__(app, minimum_size)
+        # Retire the base class's GzipFile; closing it writes a gzip trailer,
+        # so it gets a buffer of its own
+        self.gzip_file.close()
+        self.gzip_buffer = io.BytesIO()
+        self.gzip_file = _BrotliFile(self.gzip_buffer, quality)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async def send_br(message: Message) -> None:
+            # GZipResponder labels what it compressed as gzip; relabel ours
+            if message["type"] == "http.response.start" and not self.content_encoding_set:
+                headers = MutableHeaders(raw=message["headers"])
+                if headers.get("content-encoding") == "gzip":
+                    headers["Content-Encoding"] = "br"
+            await send(message)
+
+        await super().__call__(scope, receive, send_br)
+
+
+def parse_accept_encoding(value: str) -> set:
+    """
+    Codings an Accept-Encoding value allows; q=0 (in any spelling) refuses one.
+    """
+    accepted = set()
+    for part in value.lower().split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, raw = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(raw.strip())
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def accepted_encodings(headers: Headers) -> set:
+    return parse_accept_encoding(headers.get("accept-encoding", ""))
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = MINIMUM_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            accepted = accepted_encodings(Headers(scope=scope))
+            if brotli is not None and "br" in accepted:
+                await BrotliResponder(self.app, self.minimum_size)(scope, receive, send)
+                return
+            if "gzip" in accepted:
+                await GZipResponder(self.app, self.minimum_size, compresslevel=GZIP_LEVEL)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -1,4 +1,5 @@
 import os
+from sqlalchemy import event, inspect, text
 from sqlalchemy.engine.url import make_url
 from sqlmodel import SQLModel, create_engine, Session
 from .settings import settings
@@ -13,6 +14,29 @@ engine = create_engine(
     connect_args=connect_args,
 )
 
+if settings.db_url.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _sqlite_connection_pragmas(dbapi_connection, _record):
+        # Web and worker processes write to the same file; wait on locks
+        # instead of failing with "database is locked"
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+def configure_sqlite() -> None:
+    """
+    WAL lets the dashboard read while a worker writes; it sticks to the file.
+    """
+    if not settings.db_url.startswith("sqlite"):
+        return
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL;"))
+            conn.commit()
+    except Exception:
+        pass
+
 def init_db() -> None:
     if settings.db_url.startswith("sqlite"):
         url = make_url(settings.db_url)
@@ -21,7 +45,46 @@ def init_db() -> None:
             db_dir = os.path.dirname(db_path)
             if db_dir:
                 os.makedirs(db_dir, exist_ok=True)
+        # Only takes effect on an empty file; app/maintenance.py converts older ones
+        with engine.connect() as conn:
+            if not conn.execute(text("PRAGMA page_count")).scalar():
+                conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+
+def _column_default_sql(column) -> str:
+    default = column.default.arg if column.default is not None else None
+    if isinstance(default, bool):
+        return f" NOT NULL DEFAULT {int(default)}"
+    if isinstance(default, (int, float)):
+        return f" NOT NULL DEFAULT {default}"
+    if isinstance(default, str):
+        return " NOT NULL DEFAULT '" + default.replace("'", "''") + "'"
+    raise ValueError(f"Cannot add NOT NULL column {column} without a scalar default")
+
+def add_missing_columns() -> None:
+    """
+    create_all() never alters existing tables, so columns added to a model after
+    its table was created are added here (nullable, or NOT NULL with a scalar default),
+    along with any indexes the table is missing.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            missing = [c for c in table.columns if c.name not in existing]
+            for column in missing:
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" '
+                ddl += column.type.compile(dialect=engine.dialect)
+                if not column.nullable:
+                    ddl += _column_default_sql(column)
+                conn.execute(text(ddl))
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
 
 def get_session():
     with Session(engine) as session:
@@ -0,0 +1,96 @@
+import hashlib
+import random
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# MinHash over title tokens with LSH banding. 32 bands of 2 rows make any pair
+# above ~0.4 Jaccard a candidate almost surely; candidates are then confirmed
+# against the exact Jaccard of their token sets.
+NUM_HASHES = 64
+BAND_ROWS = 2
+JACCARD_THRESHOLD = 0.65
+# Below this many tokens a shared word or two is noise; only exact matches count.
+MIN_TOKENS = 3
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240501)  # fixed so signatures are stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from get has have how i if in is it its "
+    "me my of on or should so that the this to was what when where which who why will with "
+    "would you your".split()
+)
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    return frozenset(t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS)
+
+
+def _token_hash(token: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+
+
+def minhash(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    hashes = [_token_hash(t) for t in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """
+    Clusters texts by token-set similarity. `add` returns the key of the
+    cluster representative a text duplicates, or None if it starts a new cluster.
+    """
+
+    def __init__(self, threshold: float = JACCARD_THRESHOLD):
+        self.threshold = threshold
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+        self._tokens: Dict[str, FrozenSet[str]] = {}
+        self._exact: Dict[FrozenSet[str], str] = {}
+
+    def add(self, key: str, text: str) -> Optional[str]:
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+        if tokens in self._exact:
+            return self._exact[tokens]
+        self._exact[tokens] = key
+
+        if len(tokens) < MIN_TOKENS:
+            return None
+
+        signature = minhash(tokens)
+        bands = [
+            (i, signature[i:i + BAND_ROWS]) for i in range(0, NUM_HASHES, BAND_ROWS)
+        ]
+        best_key, best_score = None, self.threshold
+        checked = set()
+        for band in bands:
+            for candidate in self._buckets.get(band, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                score = jaccard(tokens, self._tokens[candidate])
+                if score >= best_score:
+                    best_key, best_score = candidate, score
+        if best_key:
+            self._exact[tokens] = best_key
+            return best_key
+
+        # Only representatives are indexed, so clusters don't drift by chaining
+        self._tokens[key] = tokens
+        for band in bands:
+            self._buckets.setdefault(band, []).append(key)
+        return None
+
+
+def cluster_key(source: str, source_id: str) -> str:
+    return f"{source}:{source_id}"
@@ -0,0 +1,217 @@
+"""
+Per-topic digest snapshots.
+
+After each ingest the worker publishes what the dashboard shows for a topic
+(post count, category summary, conversations, sub-angles) as a JSON document
+and an HTML fragment, each precompressed with gzip and, when available,
+brotli. File names carry a content hash, so a file never changes once written
+and can be cached forever by browsers, a CDN, or nginx (gzip_static /
+brotli_static) straight from settings.digest_dir.
+"""
+import gzip
+import hashlib
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from markupsafe import Markup
+from sqlalchemy import and_, func, or_
+from sqlmodel import Session, select
+
+from .compression import parse_accept_encoding
+from .dedup import cluster_key
+from .models import CategoryAngle, CategorySummary, ConversationSummary, Post, TopicDigest
+from .records import dumps
+from .settings import settings
+from .templating import IMMUTABLE, env
+
+try:  # brotli is optional; without it only gzip copies are written
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+VERSION_CHARS = 16
+FORMATS = {"json": "application/json", "html": "text/html; charset=utf-8"}
+DIGEST_NAME_RE = re.compile(rf"^[0-9a-f]{{{VERSION_CHARS}}}\.(json|html)$")
+
+
+def discussion_label(post: Post) -> str:
+    if post.source == "x":
+        return "X"
+    # https://www.reddit.com/r/<subreddit>/comments/...
+    parts = post.url.split("/r/", 1)
+    if len(parts) == 2 and parts[1]:
+        return "r/" + parts[1].split("/", 1)[0]
+    return post.source
+
+
+def related_discussions(session: Session, keys: list[str]) -> dict:
+    """
+    Maps (category, cluster key) to every post in that near-duplicate cluster.
+    """
+    if not keys:
+        return {}
+    rep_ids = {}
+    for key in keys:
+        source, _, source_id = key.partition(":")
+        rep_ids.setdefault(source, set()).add(source_id)
+    conditions = [Post.duplicate_of.in_(keys)]
+    conditions += [
+        and_(Post.source == source, Post.source_id.in_(ids)) for source, ids in rep_ids.items()
+    ]
+    related = {}
+    for post in session.exec(select(Post).where(or_(*conditions))).all():
+        key = post.duplicate_of or cluster_key(post.source, post.source_id)
+        related.setdefault((post.category, key), []).append(
+            {"label": discussion_label(post), "url": post.url}
+        )
+    return related
+
+
+def category_views(session: Session, counts: Dict[str, int]) -> List[dict]:
+    """
+    Everything the dashboard shows for each category in `counts`, in that order.
+    """
+    names = list(counts)
+    conversation_map = {}
+    conversation_rows = session.exec(
+        select(ConversationSummary)
+        .where(ConversationSummary.category.in_(names))
+        .order_by(ConversationSummary.position)
+    ).all()
+    related = related_discussions(session, [row.cluster_key for row in conversation_rows if row.cluster_key])
+    for row in conversation_rows:
+        conversation_map.setdefault(row.category, []).append(
+            {
+                "summary": row.summary,
+                "url": row.post_url,
+                "stale": row.stale,
+                "also": [
+                    d for d in related.get((row.category, row.cluster_key), [])
+                    if d["url"] != row.post_url
+                ],
+            }
+        )
+
+    angle_map = {}
+    for angle in session.exec(
+        select(CategoryAngle).where(CategoryAngle.category.in_(names)).order_by(CategoryAngle.position)
+    ).all():
+        angle_map.setdefault(angle.category, []).append(
+            {
+                "label": angle.label,
+                "size": angle.size,
+                "lead_url": angle.lead_url,
+                "lead_title": angle.lead_title,
+            }
+        )
+
+    summaries = {
+        row.category: {"text": row.summary, "stale": row.stale}
+        for row in session.exec(select(CategorySummary).where(CategorySummary.category.in_(names))).all()
+    }
+    return [
+        {
+            "name": name,
+            "count": count,
+            "summary": summaries.get(name),
+            "conversations": conversation_map.get(name, []),
+            "angles": angle_map.get(name, []),
+        }
+        for name, count in counts.items()
+    ]
+
+
+def render_category(view: dict) -> str:
+    return env.get_template("_category_row.html").render(c=view)
+
+
+def topic_slug(topic: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-") or "topic"
+
+
+def digest_path(topic: str, name: str) -> str:
+    return os.path.join(settings.digest_dir, topic_slug(topic), name)
+
+
+def digest_url(topic: str, version: str, fmt: str = "html") -> str:
+    return f"/digests/{topic_slug(topic)}/{version}.{fmt}"
+
+
+def _write(path: str, body: bytes) -> None:
+    # Write-then-rename so a reader never sees half a file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(body)
+    os.replace(tmp, path)
+
+
+def _write_encoded(path: str, body: bytes) -> None:
+    _write(path, body)
+    _write(path + ".gz", gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write(path + ".br", brotli.compress(body, quality=11))
+
+
+def publish_topic_digest(session: Session, topic: str) -> Optional[TopicDigest]:
+    """
+    Writes the topic's JSON + HTML snapshot and points its TopicDigest row at
+    it. Unchanged content keeps its version; a topic with no posts loses its digest.
+    """
+    topic = topic.strip().lower()
+    count = session.exec(select(func.count(Post.id)).where(Post.category == topic)).one()
+    row = session.exec(select(TopicDigest).where(TopicDigest.topic == topic)).first()
+    if not count:
+        if row:
+            session.delete(row)
+            session.commit()
+        return None
+
+    view = category_views(session, {topic: count})[0]
+    document = dumps(view).encode()
+    version = hashlib.sha256(document).hexdigest()[:VERSION_CHARS]
+    if row and row.version == version:
+        return row
+
+    os.makedirs(os.path.dirname(digest_path(topic, version)), exist_ok=True)
+    _write_encoded(digest_path(topic, f"{version}.json"), document)
+    _write_encoded(digest_path(topic, f"{version}.html"), render_category(view).encode())
+
+    row = row or TopicDigest(topic=topic, version=version)
+    row.version = version
+    row.post_count = count
+    row.published_at = datetime.utcnow()
+    session.add(row)
+    session.commit()
+    return row
+
+
+@lru_cache(maxsize=256)
+def _cached_fragment(topic: str, version: str) -> Markup:
+    # Misses raise, so they aren't cached
+    with open(digest_path(topic, f"{version}.html"), encoding="utf-8") as f:
+        return Markup(f.read())
+
+
+def read_fragment(topic: str, version: str) -> Optional[Markup]:
+    """
+    The HTML fragment for one digest version. Versions never change, so it's
+    read from disk once per process.
+    """
+    try:
+        return _cached_fragment(topic, version)
+    except OSError:
+        return None
+
+
+def pick_encoding(path: str, accept_encoding: str) -> tuple[str, Optional[str]]:
+    """
+    The precompressed copy of `path` the client accepts, as (file, content-encoding).
+    """
+    accepted = parse_accept_encoding(accept_encoding)
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding in accepted and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
@@ -0,0 +1,196 @@
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+from sqlmodel import Session, select
+
+from .breaker import CircuitOpenError
+from .dedup import NearDuplicateIndex, cluster_key
+from .models import Post
+from .records import PostRecord
+
+# Bounded so fetchers block (backpressure) when the writer falls behind.
+QUEUE_MAXSIZE = 200
+# Rows per commit; keeps transactions short and memory flat.
+WRITE_BATCH_SIZE = 100
+
+_DONE = object()
+
+
+class IngestCancelled(Exception):
+    """
+    The job behind an ingest was cancelled (its topic was removed) or lost its
+    lease; nothing more may be written for it.
+    """
+
+
+def ensure_wanted(still_wanted: Optional[Callable[[], bool]]) -> None:
+    if still_wanted is not None and not still_wanted():
+        raise IngestCancelled()
+
+
+class IngestStream(NamedTuple):
+    """
+    One producer: `items` yields (category, post) pairs for a single source.
+    """
+    source: str
+    items: AsyncIterator[Tuple[str, PostRecord]]
+
+
+class IngestResult(NamedTuple):
+    inserted: Dict[str, int]
+    errors: Dict[str, Exception]
+
+
+def compute_heat(score: int, comments: int, created_utc: int) -> float:
+    now = int(time.time())
+    age_hours = max(1.0, (now - created_utc) / 3600.0)
+    return (score * 0.6 + comments * 2.0) / (age_hours ** 0.8)
+
+
+def to_post(p: PostRecord, category: str, duplicate_of: Optional[str] = None) -> Post:
+    return Post(
+        source=p.source,
+        source_id=p.source_id,
+        category=category,
+        title=p.title,
+        url=p.url,
+        author=p.author,
+        created_utc=p.created_utc,
+        score=p.score,
+        num_comments=p.num_comments,
+        heat_score=compute_heat(p.score, p.num_comments, p.created_utc),
+        duplicate_of=duplicate_of,
+    )
+
+
+async def _produce(queue: asyncio.Queue, stream: IngestStream, errors: Dict[str, Exception]) -> None:
+    try:
+        async for item in stream.items:
+            await queue.put(item)
+    except (httpx.HTTPError, CircuitOpenError) as exc:
+        # One failing source shouldn't take the others down with it
+        errors[stream.source] = exc
+
+
+Batch = List[Tuple[str, PostRecord, Optional[str]]]
+
+
+def _flush(session: Session, batch: Batch, inserted: Dict[str, int]) -> None:
+    # One lookup per batch instead of one SELECT per row
+    existing = set()
+    for source in {p.source for _, p, _ in batch}:
+        ids = [p.source_id for _, p, _ in batch if p.source == source]
+        rows = session.exec(
+            select(Post.category, Post.source_id).where(
+                Post.source == source,
+                Post.source_id.in_(ids),
+                # Stale rows are placeholders awaiting replacement
+                Post.stale == False,  # noqa: E712
+            )
+        ).all()
+        existing.update((source, cat, sid) for cat, sid in rows)
+
+    for cat, p, duplicate_of in batch:
+        if (p.source, cat, p.source_id) in existing:
+            continue
+        session.add(to_post(p, cat, duplicate_of))
+        inserted[p.source] = inserted.get(p.source, 0) + 1
+    session.commit()
+
+
+def _dedup_index(session: Session, indexes: Dict[str, NearDuplicateIndex], category: str) -> NearDuplicateIndex:
+    index = indexes.get(category)
+    if index is None:
+        # Seed with representatives already stored for this category (e.g. tweets kept across runs)
+        index = indexes[category] = NearDuplicateIndex()
+        for source, source_id, title in session.exec(
+            select(Post.source, Post.source_id, Post.title).where(
+                Post.category == category,
+                Post.duplicate_of.is_(None),
+                Post.stale == False,  # noqa: E712
+            )
+        ).all():
+            index.add(cluster_key(source, source_id), title)
+    return index
+
+
+async def _write(
+    session: Session,
+    queue: asyncio.Queue,
+    batch_size: int,
+    still_wanted: Optional[Callable[[], bool]],
+) -> Dict[str, int]:
+    inserted: Dict[str, int] = {}
+    seen = set()
+    indexes: Dict[str, NearDuplicateIndex] = {}
+    batch: Batch = []
+
+    while True:
+        item = await queue.get()
+        if item is _DONE:
+            break
+        cat, p = item
+        key = (p.source, cat, p.source_id)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        # Near-duplicates (cross-posts, the same story under hot/new/top, matching
+        # tweets) are stored but point at their cluster's representative.
+        own_key = cluster_key(p.source, p.source_id)
+        duplicate_of = _dedup_index(session, indexes, cat).add(own_key, p.title)
+        batch.append((cat, p, duplicate_of if duplicate_of != own_key else None))
+        if len(batch) >= batch_size:
+            ensure_wanted(still_wanted)
+            _flush(session, batch, inserted)
+            batch = []
+            # Let producers refill the queue between commits
+            await asyncio.sleep(0)
+
+    if batch:
+        ensure_wanted(still_wanted)
+        _flush(session, batch, inserted)
+    return inserted
+
+
+async def ingest_streams(
+    session: Session,
+    streams: List[IngestStream],
+    batch_size: int = WRITE_BATCH_SIZE,
+    queue_size: int = QUEUE_MAXSIZE,
+    still_wanted: Optional[Callable[[], bool]] = None,
+) -> IngestResult:
+    """
+    Runs every stream concurrently into a bounded queue drained by a single writer
+    that commits in batches of `batch_size`. Duplicates (same source, category and
+    source_id) are skipped; near-duplicate titles within a category are clustered.
+    `still_wanted` is checked before every commit; IngestCancelled if it fails.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    errors: Dict[str, Exception] = {}
+    writer = asyncio.create_task(_write(session, queue, batch_size, still_wanted))
+
+    tasks = [asyncio.create_task(_produce(queue, s, errors)) for s in streams]
+    producers = asyncio.gather(*tasks)
+
+    try:
+        await asyncio.wait({writer, producers}, return_when=asyncio.FIRST_COMPLETED)
+        if writer.done():
+            # The writer only stops early on a DB error
+            writer.result()
+        await producers
+    except BaseException:
+        # Whatever failed (an unexpected producer error, the writer, cancellation),
+        # nothing may keep using the caller's session. Cancel the tasks themselves:
+        # a gather that already failed doesn't pass cancellation on.
+        for task in [*tasks, writer]:
+            task.cancel()
+        # `producers` too, so its outcome is retrieved rather than logged as lost
+        await asyncio.gather(*tasks, writer, producers, return_exceptions=True)
+        raise
+    await queue.put(_DONE)
+    inserted = await writer
+
+    return IngestResult(inserted=inserted, errors=errors)
@@ -1,7 +1,11 @@
 import httpx
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
+
+from .breaker import breaker, upstream_failed
+from .records import CommentRecord, PostRecord, loads
 
 USER_AGENT = "theangle/0.1"
+REDDIT_PAGE_LIMIT = 100  # Reddit caps listing pages at 100 items
 
 QUESTION_WORDS = ("how", "why", "what", "where", "when", "should", "best", "recommend")
 
@@ -9,26 +13,8 @@ def looks_like_question(title: str) -> bool:
     t = (title or "").strip().lower()
     return ("?" in t) or any(t.startswith(w + " ") for w in QUESTION_WORDS)
 
-async def fetch_reddit(
-    subreddit: str,
-    sort: str = "hot",
-    limit: int = 50,
-    conversations_only: bool = True,
-) -> List[Dict]:
-    """
-    conversations_only=True filters to self posts + question-like titles (more discussion, fewer link posts).
-    """
-    url = f"https://www.reddit.com/r/{subreddit}/{sort}.json?limit={limit}"
-    headers = {"User-Agent": USER_AGENT}
-
-    async with httpx.AsyncClient(timeout=20.0, headers=headers) as client:
-        r = await client.get(url)
-        # If subreddit doesn't exist, Reddit returns 404 or a JSON with error; handle both
-        if r.status_code == 404:
-            return []
-        r.raise_for_status()
-        data = r.json()
 
+def _listing_posts(data: Dict, conversations_only: bool) -> List[PostRecord]:
     out = []
     for c in data.get("data", {}).get("children", []):
         d = c.get("data", {})
@@ -43,83 +29,119 @@ async def fetch_reddit(
             if not is_self and not looks_like_question(title):
                 continue
 
-        out.append({
-            "source": "reddit",
-            "source_id": d.get("id"),
-            "title": title,
-            "url": "https://www.reddit.com" + (d.get("permalink") or ""),
-            "author": d.get("author"),
-            "created_utc": int(d.get("created_utc") or 0),
-            "score": int(d.get("score") or 0),
-            "num_comments": int(d.get("num_comments") or 0),
-        })
-
+        out.append(PostRecord(
+            source="reddit",
+            source_id=d.get("id"),
+            title=title,
+            url="https://www.reddit.com" + (d.get("permalink") or ""),
+            author=d.get("author"),
+            created_utc=int(d.get("created_utc") or 0),
+            score=int(d.get("score") or 0),
+            num_comments=int(d.get("num_comments") or 0),
+        ))
     return out
 
 
+async def _iter_listing(
+    url: str,
+    params: Dict,
+    limit: int,
+    max_pages: int,
+    conversations_only: bool,
+    raise_for_status: bool = False,
+) -> AsyncIterator[PostRecord]:
+    """
+    Walks a Reddit listing page by page, following the `after` cursor.
+    Only one page is held in memory at a time.
+    """
+    headers = {"User-Agent": USER_AGENT}
+    after: Optional[str] = None
+
+    async with httpx.AsyncClient(timeout=20.0, headers=headers) as client:
+        for _ in range(max(1, max_pages)):
+            page_params = dict(params, limit=max(1, min(limit, REDDIT_PAGE_LIMIT)))
+            if after:
+                page_params["after"] = after
+
+            r = await breaker("reddit").call_async(
+                client.get, url, params=page_params, is_failure=upstream_failed
+            )
+            # If subreddit doesn't exist, Reddit returns 404 or a JSON with error; handle both
+            if r.status_code == 404:
+                return
+            if raise_for_status or upstream_failed(r):
+                # Upstream trouble must surface so ingest keeps the last good posts
+                r.raise_for_status()
+            elif r.status_code != 200:
+                return
+            data = loads(r.content)
+            posts = _listing_posts(data, conversations_only)
+            after = data.get("data", {}).get("after")
+            # Drop the full listing tree before handing records downstream
+            del data
+
+            for post in posts:
+                yield post
+
+            if not after:
+                return
+
+
+async def fetch_reddit(
+    subreddit: str,
+    sort: str = "hot",
+    limit: int = 50,
+    conversations_only: bool = True,
+    max_pages: int = 1,
+) -> AsyncIterator[PostRecord]:
+    """
+    conversations_only=True filters to self posts + question-like titles (more discussion, fewer link posts).
+    Yields posts across up to `max_pages` listing pages of `limit` items each.
+    """
+    url = f"https://www.reddit.com/r/{subreddit}/{sort}.json"
+    async for post in _iter_listing(
+        url, {}, limit, max_pages, conversations_only, raise_for_status=True
+    ):
+        yield post
+
+
 async def fetch_reddit_search(
     query: str,
     sort: str = "hot",
     limit: int = 50,
     conversations_only: bool = True,
-) -> List[Dict]:
+    max_pages: int = 1,
+) -> AsyncIterator[PostRecord]:
     """
     Search Reddit posts globally by topic query.
+    Yields posts across up to `max_pages` result pages of `limit` items each.
     """
     url = "https://www.reddit.com/search.json"
-    headers = {"User-Agent": USER_AGENT}
     params = {
         "q": query,
         "sort": sort,
-        "limit": limit,
         "type": "link",
     }
-
-    async with httpx.AsyncClient(timeout=20.0, headers=headers) as client:
-        r = await client.get(url, params=params)
-        if r.status_code != 200:
-            return []
-        data = r.json()
-
-    out = []
-    for c in data.get("data", {}).get("children", []):
-        d = c.get("data", {})
-        if d.get("stickied"):
-            continue
-
-        title = d.get("title") or ""
-        is_self = bool(d.get("is_self"))
-
-        if conversations_only:
-            if not is_self and not looks_like_question(title):
-                continue
-
-        out.append({
-            "source": "reddit",
-            "source_id": d.get("id"),
-            "title": title,
-            "url": "https://www.reddit.com" + (d.get("permalink") or ""),
-            "author": d.get("author"),
-            "created_utc": int(d.get("created_utc") or 0),
-            "score": int(d.get("score") or 0),
-            "num_comments": int(d.get("num_comments") or 0),
-        })
-
-    return out
+    async for post in _iter_listing(url, params, limit, max_pages, conversations_only):
+        yield post
 
 
-async def fetch_reddit_comments(post_id: str, limit: int = 6) -> List[str]:
+async def fetch_reddit_comments(post_id: str, limit: int = 6) -> List[CommentRecord]:
     """
-    Fetch top comments for a Reddit post ID.
+    Fetch top comments (body + score) for a Reddit post ID.
     """
-    url = f"https://www.reddit.com/comments/{post_id}.json?limit={limit}"
+    url = f"https://www.reddit.com/comments/{post_id}.json"
     headers = {"User-Agent": USER_AGENT}
+    # Top-level comments only, best first: replies are never used
+    params = {"limit": limit, "depth": 1, "sort": "top"}
 
     async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
-        r = await client.get(url)
+        r = await breaker("reddit").call_async(
+            client.get, url, params=params, is_failure=upstream_failed
+        )
         if r.status_code != 200:
             return []
-        data = r.json()
+        data = loads(r.content)
 
     comments = []
     if len(data) > 1:
@@ -128,7 +150,7 @@ async def fetch_reddit_comments(post_id: str, limit: int = 6) -> List[str]:
             body = (d.get("body") or "").strip()
             if not body:
                 continue
-            comments.append(body)
+            comments.append(CommentRecord(body=body, score=int(d.get("score") or 0)))
             if len(comments) >= limit:
                 break
     return comments
@@ -0,0 +1,411 @@
+"""
+The ingest itself, run by app/worker.py; the web tier only enqueues jobs
+(app/jobs.py). Per batch, one combined X search files tweets under the batch's
+topics; then per topic: fetch Reddit, replace the topic's posts, refresh its
+summaries and sub-angles.
+"""
+from datetime import datetime, timedelta
+
+import httpx
+from sqlmodel import Session, select
+from sqlalchemy import delete, func, literal, update
+from sqlalchemy.orm import aliased
+
+from .db import engine
+from .models import (
+    Post,
+    CategorySummary,
+    CategoryAngle,
+    ConversationSummary,
+    XSearchCursor,
+    IngestRun,
+    LLMUsage,
+)
+from .ingest_reddit import fetch_reddit_search
+from .comment_cache import get_post_comments
+from .ingest_x import iter_x_recent
+from .ingest_pipeline import IngestStream, compute_heat, ensure_wanted, ingest_streams
+from .dedup import cluster_key
+from .classifier import classifier_for
+from .angles import build_category_angles
+from .digests import publish_topic_digest
+from .breaker import CircuitOpenError, breaker
+from .summarizer import summarize_category, summarize_post
+from .settings import settings
+from .topics import MIXED_CATEGORY, x_search_query
+
+MAX_CONVERSATIONS_PER_TOPIC = 15
+REDDIT_PAGES_PER_SORT = 3
+MAX_POSTS_PER_ANGLE_RUN = 300
+# More than the prompt uses, so the summarizer can pick the highest-scored ones
+COMMENTS_FETCHED_PER_POST = 10
+# X recent search only covers (and only accepts a since_id from) the last 7 days;
+# leave an hour's slack
+X_SINCE_ID_MAX_AGE = timedelta(days=7) - timedelta(hours=1)
+X_SNOWFLAKE_EPOCH_MS = 1288834974657
+
+
+async def _reddit_items(topic: str, sort: str):
+    cat = topic.lower()
+    async for p in fetch_reddit_search(
+        topic,
+        sort=sort,
+        limit=50,
+        conversations_only=True,
+        max_pages=REDDIT_PAGES_PER_SORT,
+    ):
+        yield cat, p
+
+
+async def _x_items(query: str, topics: list[str], since_id: str | None):
+    """
+    One combined X search for all topics; each tweet is filed under every
+    requested topic it mentions (MIXED_CATEGORY if none, the topic itself if only one).
+    """
+    classifier = classifier_for(topics)
+    fallback = topics[0].lower() if len(topics) == 1 else MIXED_CATEGORY
+    async for p in iter_x_recent(
+        query=query,
+        bearer_token=settings.x_bearer_token,
+        max_results=settings.x_max_results,
+        since_id=since_id,
+    ):
+        for category in classifier.classify(p.title) or [fallback]:
+            yield category, p
+
+
+def _save_x_cursor(session: Session, query: str, categories: list[str]) -> None:
+    ids = session.exec(
+        select(Post.source_id).where(Post.source == "x", Post.category.in_(categories))
+    ).all()
+    newest = max((sid for sid in ids if sid and sid.isdigit()), key=int, default=None)
+    if not newest:
+        return
+    cursor = session.exec(select(XSearchCursor).where(XSearchCursor.query == query)).first()
+    if cursor:
+        cursor.newest_id = newest
+        cursor.updated_at = datetime.utcnow()
+    else:
+        cursor = XSearchCursor(query=query, newest_id=newest)
+    session.add(cursor)
+    session.commit()
+
+
+def _drop_replaced_posts(session: Session, category: str, sources: set, errors: dict) -> None:
+    """
+    Stale posts of a source that ingested cleanly are dropped. If the source
+    failed part-way, only stale posts that were fetched again are dropped; the
+    rest stay (marked stale) until the source recovers.
+    """
+    fresh = aliased(Post)
+    for source in sources:
+        query = delete(Post).where(
+            Post.category == category,
+            Post.source == source,
+            Post.stale == True,  # noqa: E712
+        )
+        if source in errors:
+            query = query.where(
+                select(fresh.id)
+                .where(
+                    fresh.source == Post.source,
+                    fresh.source_id == Post.source_id,
+                    fresh.category == Post.category,
+                    fresh.stale == False,  # noqa: E712
+                )
+                .exists()
+            )
+        session.exec(query)
+    session.commit()
+
+
+def _record_usage(run_id: int, usage: list) -> None:
+    """
+    Writes LLM calls as they complete, in a session of their own, so a run that
+    fails or loses its lease still accounts for what it spent.
+    """
+    if not usage:
+        return
+    with Session(engine) as usage_session:
+        usage_session.add_all([LLMUsage(run_id=run_id, **u._asdict()) for u in usage])
+        usage_session.commit()
+    usage.clear()
+
+
+def _ensure_wanted(session: Session, still_wanted) -> None:
+    """
+    Checked before each write phase: a job whose topic was removed (or whose
+    lease was lost) drops what it has pending and stops.
+    """
+    try:
+        ensure_wanted(still_wanted)
+    except Exception:
+        session.rollback()
+        raise
+
+
+def _conversation_posts(session: Session, category: str) -> list[Post]:
+    """
+    The Reddit posts to summarize: the hottest one of each near-duplicate
+    cluster. A tweet may lead a cluster, and then several Reddit posts share it.
+    """
+    cluster = func.coalesce(Post.duplicate_of, literal("reddit:") + Post.source_id)
+    ranked = (
+        select(
+            Post.id,
+            func.row_number()
+            .over(partition_by=cluster, order_by=(Post.heat_score.desc(), Post.id))
+            .label("rank"),
+        )
+        .where(Post.category == category, Post.source == "reddit")
+        .subquery()
+    )
+    return session.exec(
+        select(Post)
+        .join(ranked, ranked.c.id == Post.id)
+        .where(ranked.c.rank == 1)
+        .order_by(Post.heat_score.desc(), Post.id)
+        .limit(MAX_CONVERSATIONS_PER_TOPIC)
+    ).all()
+
+
+def _usable_since_id(cursor: XSearchCursor | None) -> str | None:
+    """
+    The cursor's since_id, unless it's older than X recent search accepts.
+    Tweet ids carry their creation time; other ids fall back to when the cursor moved.
+    """
+    if not cursor:
+        return None
+    cutoff = datetime.utcnow() - X_SINCE_ID_MAX_AGE
+    if cursor.newest_id.isdigit():
+        created_ms = (int(cursor.newest_id) >> 22) + X_SNOWFLAKE_EPOCH_MS
+        if datetime.utcfromtimestamp(created_ms / 1000) < cutoff:
+            return None
+    if cursor.updated_at < cutoff:
+        return None
+    return cursor.newest_id
+
+
+def _mark_tweets_stale(session: Session, categories: list[str], stale: bool) -> None:
+    session.exec(
+        update(Post).where(Post.source == "x", Post.category.in_(categories)).values(stale=stale)
+    )
+    session.commit()
+
+
+async def ingest_x_search(session: Session, topics: list[str], still_wanted=None) -> str:
+    """
+    A batch's combined X recent search: one query for all its topics, each tweet
+    filed by the classifier. Runs before the batch's topic jobs; returns the X
+    part of their status line. `still_wanted` is checked before every write.
+    """
+    cats = list(dict.fromkeys(t.strip().lower() for t in topics if t.strip()))
+    if not settings.x_bearer_token or not cats:
+        return "X not configured"
+    if breaker("x").is_open():
+        return "X unavailable, showing last results"
+    _ensure_wanted(session, still_wanted)
+    query = x_search_query(cats)
+    categories = cats + ([MIXED_CATEGORY] if len(cats) > 1 else [])
+    cursor = session.exec(select(XSearchCursor).where(XSearchCursor.query == query)).first()
+    since_id = _usable_since_id(cursor)
+    if cursor and not since_id:
+        # Too old for X to accept as since_id; start over
+        session.delete(cursor)
+        cursor = None
+
+    # With a since_id cursor every stored tweet came from this query; keep them,
+    # the fetch only adds newer ones. Otherwise they're replaced once the fetch is in.
+    _mark_tweets_stale(session, categories, stale=cursor is None)
+    result = await ingest_streams(
+        session, [IngestStream("x", _x_items(query, cats, since_id))], still_wanted=still_wanted
+    )
+
+    error = result.errors.get("x")
+    if since_id and isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 400:
+        # X rejected the since_id (e.g. its window moved on); retry once without it
+        session.delete(cursor)
+        _mark_tweets_stale(session, categories, stale=True)
+        result = await ingest_streams(
+            session, [IngestStream("x", _x_items(query, cats, None))], still_wanted=still_wanted
+        )
+    _ensure_wanted(session, still_wanted)
+    for category in categories:
+        _drop_replaced_posts(session, category, {"x"}, result.errors)
+
+    error = result.errors.get("x")
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"X skipped ({error.response.status_code})"
+    if isinstance(error, CircuitOpenError):
+        return "X skipped (unavailable)"
+    if error is not None:
+        return "X skipped (network error)"
+    _save_x_cursor(session, query, categories)
+    return f"{result.inserted.get('x', 0)} new X posts"
+
+
+async def ingest_topic(
+    session: Session,
+    topic: str,
+    batch_id: str | None = None,
+    x_status: str | None = None,
+    still_wanted=None,
+) -> str:
+    """
+    Ingests Reddit conversations for one topic, then updates its AI summaries.
+    Tweets come from the batch's X search (ingest_x_search), whose outcome is
+    passed in as `x_status`. `still_wanted` is checked before every write;
+    IngestCancelled once it fails. Returns the status line shown on the dashboard.
+    """
+    cat = topic.strip().lower()
+    _ensure_wanted(session, still_wanted)
+    run = IngestRun(topics=cat, batch_id=batch_id)
+    session.add(run)
+    session.commit()
+    session.refresh(run)
+    llm_usage = []
+
+    # With its breaker open Reddit is skipped outright; the last good posts are kept.
+    reddit_open = breaker("reddit").is_open()
+    source_status = ["Reddit unavailable, showing last results"] if reddit_open else []
+    kept_sources = {"reddit"} | ({"x"} if settings.x_bearer_token else set())
+
+    # Reddit posts are only marked stale here and are dropped once their
+    # replacements are in, so a failing upstream can't wipe them. Tweets belong
+    # to the X search. Summaries are replaced below.
+    session.exec(delete(CategoryAngle).where(CategoryAngle.category == cat))
+    session.exec(delete(Post).where(Post.category == cat, Post.source.not_in(kept_sources)))
+    for kept in session.exec(
+        select(Post).where(Post.category == cat, Post.source.in_(kept_sources))
+    ).all():
+        kept.heat_score = compute_heat(kept.score, kept.num_comments, kept.created_utc)
+        if kept.source == "reddit":
+            kept.stale = True
+        session.add(kept)
+    session.commit()
+
+    # --- Ingest: fetchers stream into a bounded queue, one writer commits in batches ---
+    streams = []
+    if not reddit_open:
+        streams += [IngestStream("reddit", _reddit_items(topic, sort)) for sort in ("hot", "new", "top")]
+
+    result = await ingest_streams(session, streams, still_wanted=still_wanted)
+    inserted_reddit = result.inserted.get("reddit", 0)
+    _ensure_wanted(session, still_wanted)
+    if not reddit_open:
+        _drop_replaced_posts(session, cat, {"reddit"}, result.errors)
+
+    has_posts = session.exec(select(Post.id).where(Post.category == cat).limit(1)).first() is not None
+    if not has_posts:
+        session.exec(delete(CategorySummary).where(CategorySummary.category == cat))
+        session.exec(delete(ConversationSummary).where(ConversationSummary.category == cat))
+        session.commit()
+
+    # --- AI summaries (no tiers in-build; later we’ll gate behind Stripe paid) ---
+    summary_failures = 0
+    titles = [
+        p.title
+        for p in session.exec(
+            select(Post)
+            .where(Post.category == cat, Post.duplicate_of.is_(None))
+            .order_by(Post.heat_score.desc())
+            .limit(30)
+        ).all()
+    ]
+    row = session.exec(select(CategorySummary).where(CategorySummary.category == cat)).first()
+    if titles:
+        try:
+            try:
+                summary = summarize_category(cat, titles, usage=llm_usage)
+            finally:
+                _record_usage(run.id, llm_usage)
+        except Exception:
+            # Don’t break ingestion if OpenAI isn’t configured or is down; keep the last good summary
+            session.rollback()
+            summary_failures += 1
+            if row:
+                row.stale = True
+                session.add(row)
+        else:
+            if row:
+                row.summary = summary
+                row.stale = False
+                row.updated_at = datetime.utcnow()
+                session.add(row)
+            else:
+                session.add(CategorySummary(category=cat, summary=summary))
+        _ensure_wanted(session, still_wanted)
+        session.commit()
+
+    if not summary_failures:
+        summary_status = "Summaries updated"
+    elif breaker("openai").is_open():
+        summary_status = "OpenAI unavailable, showing last summaries"
+    else:
+        summary_status = "Summaries skipped (check OPENAI_API_KEY)"
+
+    # --- Conversation summaries ---
+    comments_by_post = {}
+    top_posts = _conversation_posts(session, cat)
+    fresh = []
+    try:
+        for idx, post in enumerate(top_posts):
+            comments = await get_post_comments(session, post, limit=COMMENTS_FETCHED_PER_POST)
+            # Keep the cached comments even if a later summary fails
+            session.commit()
+            comments_by_post[post.id] = [c.body for c in comments]
+            try:
+                summary = summarize_post(post.title, comments, category=cat, usage=llm_usage)
+            finally:
+                _record_usage(run.id, llm_usage)
+            fresh.append(
+                ConversationSummary(
+                    category=cat,
+                    post_url=post.url,
+                    summary=summary,
+                    position=idx,
+                    cluster_key=post.duplicate_of or cluster_key(post.source, post.source_id),
+                    stale=post.stale,
+                )
+            )
+    except Exception:
+        # Keep the last good conversation list rather than a partial one; the
+        # failure may have been a database error, so start from a clean transaction
+        session.rollback()
+        session.exec(
+            update(ConversationSummary)
+            .where(ConversationSummary.category == cat)
+            .values(stale=True)
+        )
+    else:
+        session.exec(delete(ConversationSummary).where(ConversationSummary.category == cat))
+        session.add_all(fresh)
+    _ensure_wanted(session, still_wanted)
+    session.commit()
+
+    # --- Sub-angles: local TF-IDF clustering, no LLM calls ---
+    posts = session.exec(
+        select(Post)
+        .where(Post.category == cat, Post.duplicate_of.is_(None))
+        .order_by(Post.heat_score.desc())
+        .limit(MAX_POSTS_PER_ANGLE_RUN)
+    ).all()
+    build_category_angles(session, cat, posts, comments_by_post)
+    _ensure_wanted(session, still_wanted)
+    session.commit()
+
+    # --- Snapshot for the dashboard / CDN ---
+    _ensure_wanted(session, still_wanted)
+    publish_topic_digest(session, cat)
+
+    run.finished_at = datetime.utcnow()
+    session.add(run)
+    session.commit()
+
+    if "reddit" in result.errors:
+        source_status.append("Reddit partially unavailable")
+    return " • ".join(
+        [f"Ingested {inserted_reddit} Reddit posts", summary_status]
+        + ([x_status] if x_status else [])
+        + source_status
+    )
@@ -1,39 +1,87 @@
 import httpx
-from typing import List, Dict, Optional
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from .breaker import breaker, upstream_failed
+from .records import PostRecord, loads
 
 # NOTE: Requires X API access + bearer token.
 # We keep this minimal; we can expand to search queries, lists, etc.
 
-async def fetch_x_recent(query: str, bearer_token: str, max_results: int = 25) -> List[Dict]:
-    if not bearer_token:
-        return []
+X_PAGE_MIN = 10
+X_PAGE_MAX = 100  # recent search caps a page at 100 tweets
+
+
+def parse_x_timestamp(value: Optional[str]) -> int:
+    """
+    X returns ISO-8601 UTC timestamps like 2024-05-01T12:34:56.000Z.
+    """
+    if not value:
+        return 0
+    try:
+        return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return 0
+
+
+async def iter_x_recent(
+    query: str,
+    bearer_token: str,
+    max_results: int = 100,
+    since_id: Optional[str] = None,
+) -> AsyncIterator[PostRecord]:
+    """
+    Yields recent tweets for `query`, following `meta.next_token` until
+    `max_results` tweets have been returned or results run out.
+    Pass `since_id` to only fetch tweets newer than a previous run.
+    """
+    if not bearer_token or max_results <= 0:
+        return
 
     url = "https://api.x.com/2/tweets/search/recent"
     headers = {"Authorization": f"Bearer {bearer_token}"}
     params = {
         "query": query,
-        "max_results": max(10, min(max_results, 100)),
         "tweet.fields": "created_at,public_metrics,author_id",
     }
+    if since_id:
+        params["since_id"] = since_id
+
+    remaining = max_results
+    next_token: Optional[str] = None
 
     async with httpx.AsyncClient(timeout=20.0, headers=headers) as client:
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        data = r.json()
-
-    tweets = data.get("data", []) or []
-    out: List[Dict] = []
-    for t in tweets:
-        metrics = t.get("public_metrics") or {}
-        out.append({
-            "source": "x",
-            "source_id": t.get("id"),
-            "title": (t.get("text") or "")[:280],
-            "url": f"https://x.com/i/web/status/{t.get('id')}",
-            "author": t.get("author_id"),
-            "created_utc": 0,  # we’ll compute later if needed
-            "score": int(metrics.get("like_count") or 0),
-            "num_comments": int(metrics.get("reply_count") or 0),
-        })
-    return out
+        while remaining > 0:
+            page_params = dict(params, max_results=max(X_PAGE_MIN, min(remaining, X_PAGE_MAX)))
+            if next_token:
+                page_params["next_token"] = next_token
+
+            r = await breaker("x").call_async(
+                client.get, url, params=page_params, is_failure=upstream_failed
+            )
+            r.raise_for_status()
+            data = loads(r.content)
+
+            tweets = (data.get("data", []) or [])[:remaining]
+            next_token = (data.get("meta") or {}).get("next_token")
+            page = [
+                PostRecord(
+                    source="x",
+                    source_id=t.get("id"),
+                    title=(t.get("text") or "")[:280],
+                    url=f"https://x.com/i/web/status/{t.get('id')}",
+                    author=t.get("author_id"),
+                    created_utc=parse_x_timestamp(t.get("created_at")),
+                    score=int((t.get("public_metrics") or {}).get("like_count") or 0),
+                    num_comments=int((t.get("public_metrics") or {}).get("reply_count") or 0),
+                )
+                for t in tweets
+            ]
+            del data, tweets
+
+            for post in page:
+                yield post
+            remaining -= len(page)
 
+            if not next_token:
+                return
@@ -0,0 +1,321 @@
+"""
+Ingest job queue backed by the IngestJob table.
+
+Workers claim jobs with a compare-and-set UPDATE, so any number of workers on
+any number of nodes can share one database without two of them running the
+same job. A claimed job carries a lease that the owner renews while it works;
+if the owner dies the lease runs out and another worker picks the job up.
+
+Topics queued together form a batch: one job per topic, plus one X job that runs
+a single combined search for all of them. A batch's topic jobs wait until its X
+job is done, so their summaries and digests include the tweets.
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import (
+    CategoryAngle,
+    CategorySummary,
+    ContentVersion,
+    ConversationSummary,
+    IngestJob,
+    Post,
+    TopicDigest,
+    XSearchCursor,
+)
+from .settings import settings
+from .topics import MIXED_CATEGORY, x_search_query
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+TOPIC = "topic"
+X_SEARCH = "x"
+
+LEASE_SECONDS = 120
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 3
+# Candidates looked at per claim; more only matters when many workers race
+CLAIM_BATCH = 5
+
+
+def clear_topics_except(session: Session, topics: list[str]) -> None:
+    """
+    Drops everything stored for categories outside `topics`, so the dashboard
+    matches the latest requested topics.
+    """
+    keep = [t.lower() for t in topics]
+    if len(keep) > 1:
+        keep.append(MIXED_CATEGORY)
+    removed = sum(
+        session.exec(statement).rowcount
+        for statement in (
+            delete(Post).where(Post.category.not_in(keep)),
+            delete(CategorySummary).where(CategorySummary.category.not_in(keep)),
+            delete(ConversationSummary).where(ConversationSummary.category.not_in(keep)),
+            delete(CategoryAngle).where(CategoryAngle.category.not_in(keep)),
+            delete(TopicDigest).where(TopicDigest.topic.not_in(keep)),
+        )
+    )
+    # Cursors for other queries point at tweets that were just removed
+    session.exec(delete(XSearchCursor).where(XSearchCursor.query != x_search_query(topics)))
+    if removed:
+        bump_content_version(session)
+    session.commit()
+
+
+def bump_content_version(session: Session) -> None:
+    """
+    Marks stored results as changed for API clients; the caller commits.
+    """
+    now = datetime.utcnow()
+    bumped = session.exec(
+        update(ContentVersion).values(version=ContentVersion.version + 1, updated_at=now)
+    )
+    if not bumped.rowcount:
+        session.add(ContentVersion(version=1, updated_at=now))
+
+
+def enqueue_ingest(session: Session, topics: Iterable[str]) -> List[str]:
+    """
+    Queues a batch: one job per topic (topics that already have one waiting join
+    the batch instead) and, with X configured, the batch's combined X search.
+    Jobs for topics no longer requested are cancelled, running ones included:
+    their worker notices before its next write (app/worker.py). Returns the topics queued.
+    """
+    wanted = list(dict.fromkeys(t.strip().lower() for t in topics if t.strip()))
+    batch_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    session.exec(
+        update(IngestJob)
+        .where(
+            IngestJob.kind == TOPIC,
+            IngestJob.status.in_([QUEUED, RUNNING]),
+            IngestJob.topic.not_in(wanted),
+        )
+        .values(status=CANCELLED, finished_at=now, lease_expires_at=None)
+    )
+    waiting = select(IngestJob.id).where(
+        IngestJob.kind == TOPIC, IngestJob.status == QUEUED, IngestJob.topic.in_(wanted)
+    )
+    waiting_topics = set(
+        session.exec(select(IngestJob.topic).where(IngestJob.id.in_(waiting))).all()
+    )
+    session.exec(update(IngestJob).where(IngestJob.id.in_(waiting)).values(batch_id=batch_id))
+    queued = [t for t in wanted if t not in waiting_topics]
+    session.add_all([IngestJob(topic=t, batch_id=batch_id) for t in queued])
+
+    # One X search per batch. An earlier one for other topics is superseded
+    # (it would file tweets under removed topics); one for exactly these topics
+    # is adopted rather than repeated.
+    x_topics = ",".join(wanted)
+    session.exec(
+        update(IngestJob)
+        .where(
+            IngestJob.kind == X_SEARCH,
+            IngestJob.status.in_([QUEUED, RUNNING]),
+            IngestJob.topic != x_topics,
+        )
+        .values(status=CANCELLED, finished_at=now, lease_expires_at=None)
+    )
+    if settings.x_bearer_token and wanted:
+        pending_x = session.exec(
+            select(IngestJob).where(
+                IngestJob.kind == X_SEARCH,
+                IngestJob.status.in_([QUEUED, RUNNING]),
+                IngestJob.topic == x_topics,
+            )
+        ).first()
+        if pending_x:
+            pending_x.batch_id = batch_id
+            session.add(pending_x)
+        else:
+            session.add(IngestJob(kind=X_SEARCH, topic=x_topics, batch_id=batch_id))
+    session.commit()
+    return queued
+
+
+def _claimable(now: datetime):
+    # Waiting, or running under a lease nobody renewed
+    return and_(
+        IngestJob.attempts < MAX_ATTEMPTS,
+        or_(
+            IngestJob.status == QUEUED,
+            and_(IngestJob.status == RUNNING, IngestJob.lease_expires_at < now),
+        ),
+    )
+
+
+def _topic_free(now: datetime):
+    # Never run two jobs for the same topic at once
+    busy = select(IngestJob.topic).where(
+        IngestJob.status == RUNNING, IngestJob.lease_expires_at >= now
+    )
+    return IngestJob.topic.not_in(busy)
+
+
+def _batch_ready():
+    # A topic job waits while its batch's X search can still run
+    x_job = aliased(IngestJob)
+    pending_x = (
+        select(x_job.id)
+        .where(
+            x_job.kind == X_SEARCH,
+            x_job.batch_id == IngestJob.batch_id,
+            x_job.status.in_([QUEUED, RUNNING]),
+        )
+        .exists()
+    )
+    return or_(IngestJob.kind == X_SEARCH, IngestJob.batch_id.is_(None), ~pending_x)
+
+
+def _fail_exhausted(session: Session, now: datetime) -> None:
+    session.exec(
+        update(IngestJob)
+        .where(
+            IngestJob.status == RUNNING,
+            IngestJob.lease_expires_at < now,
+            IngestJob.attempts >= MAX_ATTEMPTS,
+        )
+        .values(status=FAILED, error="lease expired", finished_at=now)
+    )
+
+
+def claim_next(worker_id: str) -> Optional[IngestJob]:
+    """
+    Takes the oldest claimable job for `worker_id`, or returns None.
+    """
+    with Session(engine, expire_on_commit=False) as session:
+        now = datetime.utcnow()
+        _fail_exhausted(session, now)
+        session.commit()
+        candidates = session.exec(
+            select(IngestJob.id)
+            .where(_claimable(now), _topic_free(now), _batch_ready())
+            .order_by(IngestJob.created_at, IngestJob.id)
+            .limit(CLAIM_BATCH)
+        ).all()
+        for job_id in candidates:
+            claimed = session.exec(
+                update(IngestJob)
+                .where(IngestJob.id == job_id, _claimable(now), _topic_free(now), _batch_ready())
+                .values(
+                    status=RUNNING,
+                    lease_owner=worker_id,
+                    lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                    heartbeat_at=now,
+                    attempts=IngestJob.attempts + 1,
+                    started_at=now,
+                )
+            )
+            session.commit()
+            # Someone else got there first if no row changed
+            if claimed.rowcount == 1:
+                return session.get(IngestJob, job_id)
+    return None
+
+
+def _owned(job_id: int, worker_id: str):
+    return and_(
+        IngestJob.id == job_id,
+        IngestJob.status == RUNNING,
+        IngestJob.lease_owner == worker_id,
+    )
+
+
+def job_active(job_id: int, worker_id: str) -> bool:
+    """
+    Whether `worker_id` still owns the running job: False once it was cancelled
+    or its lease passed to another worker.
+    """
+    with Session(engine) as session:
+        return session.exec(select(IngestJob.id).where(_owned(job_id, worker_id))).first() is not None
+
+
+def renew_lease(job_id: int, worker_id: str) -> bool:
+    """
+    Heartbeat: pushes the lease forward. False means the lease was lost.
+    """
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        renewed = session.exec(
+            update(IngestJob)
+            .where(_owned(job_id, worker_id))
+            .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=LEASE_SECONDS))
+        )
+        session.commit()
+        return renewed.rowcount == 1
+
+
+def finish_job(job_id: int, worker_id: str, message: str) -> bool:
+    with Session(engine) as session:
+        done = session.exec(
+            update(IngestJob)
+            .where(_owned(job_id, worker_id))
+            .values(status=DONE, message=message, finished_at=datetime.utcnow(), lease_expires_at=None)
+        )
+        session.commit()
+        return done.rowcount == 1
+
+
+def fail_job(job_id: int, worker_id: str, error: str) -> bool:
+    """
+    Puts the job back in the queue, or marks it failed once it's out of attempts.
+    """
+    with Session(engine) as session:
+        job = session.get(IngestJob, job_id)
+        retry = job is not None and job.attempts < MAX_ATTEMPTS
+        failed = session.exec(
+            update(IngestJob)
+            .where(_owned(job_id, worker_id))
+            .values(
+                status=QUEUED if retry else FAILED,
+                error=error[:500],
+                lease_owner=None,
+                lease_expires_at=None,
+                finished_at=None if retry else datetime.utcnow(),
+            )
+        )
+        session.commit()
+        return failed.rowcount == 1
+
+
+def latest_jobs(session: Session, topics: Iterable[str]) -> List[IngestJob]:
+    """
+    Most recent job per topic, in the order given.
+    """
+    wanted = [t.strip().lower() for t in topics if t.strip()]
+    newest = (
+        select(func.max(IngestJob.id))
+        .where(IngestJob.kind == TOPIC, IngestJob.topic.in_(wanted), IngestJob.status != CANCELLED)
+        .group_by(IngestJob.topic)
+    )
+    latest = {job.topic: job for job in session.exec(select(IngestJob).where(IngestJob.id.in_(newest))).all()}
+    return [latest[t] for t in wanted if t in latest]
+
+
+def batch_x_status(session: Session, batch_id: Optional[str]) -> Optional[str]:
+    """
+    How the batch's X search went, for its topic jobs' status lines.
+    """
+    if not batch_id:
+        return None
+    job = session.exec(
+        select(IngestJob)
+        .where(IngestJob.kind == X_SEARCH, IngestJob.batch_id == batch_id)
+        .order_by(IngestJob.id.desc())
+    ).first()
+    if job is None or job.status == CANCELLED:
+        return None
+    if job.status == FAILED:
+        return "X skipped (search failed)"
+    return job.message
@@ -1,19 +1,24 @@
 # app/main.py
-import time
-from urllib.parse import quote_plus
+import logging
+import os
+from urllib.parse import quote_plus, urlencode
 from datetime import datetime
 
-import httpx
+import anyio
 from fastapi import FastAPI, Request, Depends, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, Response
+from markupsafe import Markup
 
 from sqlmodel import Session, select
-from sqlalchemy import delete, text
-
-from .db import init_db, get_session, engine
-from .models import User, Post, CategorySummary, ConversationSummary, UserTopic
+from sqlalchemy import delete
+
+from .db import configure_sqlite, init_db, get_session
+from .models import (
+    User,
+    Post,
+    UserTopic,
+    TopicDigest,
+)
 from .auth import (
     hash_password,
     verify_password,
@@ -22,197 +27,49 @@ from .auth import (
     MAX_AGE_SECONDS,
     get_current_user,
 )
-from .ingest_reddit import fetch_reddit_search, fetch_reddit_comments
-from .ingest_x import fetch_x_recent
-from .summarizer import summarize_category, summarize_post
-from .stripe_billing import create_checkout_session
+from .jobs import clear_topics_except, enqueue_ingest, latest_jobs
+from .digests import (
+    FORMATS,
+    DIGEST_NAME_RE,
+    IMMUTABLE,
+    category_views,
+    digest_path,
+    pick_encoding,
+    read_fragment,
+    topic_slug,
+)
+from .topics import TOPIC_CHOICES
+from .search import init_search_index, search
+from .stripe_billing import (
+    STRIPE_CONCURRENCY,
+    get_stripe,
+    record_event,
+    start_checkout,
+    stripe_errors,
+)
 from .settings import settings
+from .templating import STATIC_DIR, CachedStaticFiles, fragment, templates
+from .compression import CompressionMiddleware
+from .api import ApiError, api_error_handler, router as api_router
 
 app = FastAPI(title="The Angle")
-templates = Jinja2Templates(directory="app/templates")
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.add_middleware(CompressionMiddleware)
+app.include_router(api_router)
+app.add_exception_handler(ApiError, api_error_handler)
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR), name="static")
 
 LAST_TOPICS_COOKIE = "last_topics"
-MAX_CONVERSATIONS_PER_TOPIC = 15
-TOPIC_CHOICES = [
-    "ai",
-    "art",
-    "books",
-    "business",
-    "careers",
-    "climate",
-    "coding",
-    "cooking",
-    "crypto",
-    "culture",
-    "design",
-    "economics",
-    "education",
-    "energy",
-    "entrepreneurship",
-    "fashion",
-    "finance",
-    "fitness",
-    "food",
-    "gaming",
-    "health",
-    "history",
-    "investing",
-    "law",
-    "marketing",
-    "medicine",
-    "movies",
-    "music",
-    "parenting",
-    "personal finance",
-    "philosophy",
-    "photography",
-    "politics",
-    "productivity",
-    "real estate",
-    "relationships",
-    "science",
-    "sports",
-    "startups",
-    "sustainability",
-    "technology",
-    "travel",
-    "venture capital",
-    "wellness",
-    "world news",
-    "youth culture",
-    "cars",
-    "space",
-    "cybersecurity",
-    "data science",
-    "robotics",
-    "blockchain",
-    "economy",
-    "leadership",
-    "remote work",
-    "ecommerce",
-    "ux",
-    "architecture",
-    "biology",
-    "chemistry",
-    "physics",
-    "psychology",
-    "sociology",
-    "podcasts",
-    "startups funding",
-    "strategy",
-    "fundraising",
-    "management",
-    "sales",
-    "security",
-    "privacy",
-    "hardware",
-    "mobile",
-    "cloud",
-    "devops",
-    "open source",
-    "artificial intelligence",
-    "machine learning",
-    "product management",
-    "fintech",
-    "banking",
-    "insurance",
-    "retail",
-    "supply chain",
-    "logistics",
-    "manufacturing",
-    "energy transition",
-    "renewables",
-    "agriculture",
-    "environment",
-    "nonprofits",
-    "global affairs",
-    "geopolitics",
-    "econometric",
-    "public policy",
-    "journalism",
-    "media",
-    "social media",
-    "culture wars",
-    "space exploration",
-    "astronomy",
-    "mathematics",
-    "linguistics",
-    "language learning",
-    "career switching",
-    "investor relations",
-    "board governance",
-    "corporate strategy",
-    "consumer tech",
-    "enterprise tech",
-    "biotech",
-    "pharma",
-    "mental health",
-    "nutrition",
-    "restaurants",
-    "recipes",
-    "home improvement",
-    "interior design",
-    "gardening",
-    "outdoors",
-    "camping",
-    "hiking",
-    "running",
-    "cycling",
-    "soccer",
-    "basketball",
-    "baseball",
-    "football",
-    "tennis",
-    "golf",
-    "esports",
-    "board games",
-    "comics",
-    "anime",
-    "education policy",
-    "student life",
-    "hr",
-    "recruiting",
-    "legal tech",
-    "climate tech",
-    "robotics startups",
-    "quant finance",
-]
-
-
-def compute_heat(score: int, comments: int, created_utc: int) -> float:
-    now = int(time.time())
-    age_hours = max(1.0, (now - created_utc) / 3600.0)
-    return (score * 0.6 + comments * 2.0) / (age_hours ** 0.8)
-
-
-def naive_category(title: str) -> str:
-    t = (title or "").lower()
-    if any(k in t for k in ["intern", "resume", "interview", "recruit"]):
-        return "careers"
-    if any(k in t for k in ["stock", "options", "trading", "crypto", "market", "earnings"]):
-        return "markets"
-    if any(k in t for k in ["startup", "saas", "churn", "mrr", "founder", "fundraising"]):
-        return "startups"
-    if any(k in t for k in ["python", "java", "react", "fastapi", "api", "docker", "kubernetes"]):
-        return "coding"
-    if any(k in t for k in ["food", "recipe", "cooking", "nutrition", "diet"]):
-        return "food"
-    return "misc"
+STRIPE_LIMITER = anyio.CapacityLimiter(STRIPE_CONCURRENCY)
+
+log = logging.getLogger("theangle.web")
 
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    init_search_index()
     # SQLite pragmas to reduce "database is locked" during writes
-    try:
-        with engine.connect() as conn:
-            conn.execute(text("PRAGMA journal_mode=WAL;"))
-            conn.execute(text("PRAGMA synchronous=NORMAL;"))
-            conn.execute(text("PRAGMA busy_timeout=5000;"))
-            conn.commit()
-    except Exception:
-        pass
+    configure_sqlite()
 
 
 def render(request: Request, name: str, ctx: dict):
@@ -297,8 +154,11 @@ def topics_page(request: Request, session: Session = Depends(get_session)):
         "topics.html",
         {
             "user": user,
-            "topics": TOPIC_CHOICES,
-            "selected_topics": selected,
+            # Each pill is rendered once per process; only the checked state varies
+            "topic_pills": Markup("").join(
+                fragment("_topic_pill.html", topic=topic, checked=topic in selected)
+                for topic in TOPIC_CHOICES
+            ),
         },
     )
 
@@ -375,25 +235,10 @@ def dashboard(request: Request, category: str | None = None, session: Session =
     ranked = sorted(counts.items(), key=lambda x: x[1], reverse=True)
     ranked_map = dict(ranked)
 
-    conversation_map = {}
-    conversation_rows = session.exec(
-        select(ConversationSummary).order_by(ConversationSummary.position)
-    ).all()
-    for row in conversation_rows:
-        conversation_map.setdefault(row.category, []).append(
-            {"summary": row.summary, "url": row.post_url}
-        )
+    stale_sources = sorted(
+        set(session.exec(select(Post.source).where(Post.stale == True)).all())  # noqa: E712
+    )
 
-    # Summaries
-    categories = []
-    for k, v in ranked:
-        categories.append(
-            {
-                "name": k,
-                "count": v,
-                "conversations": conversation_map.get(k, []),
-            }
-        )
     featured_topics = []
     if user_topics:
         featured_topics = sorted(
@@ -401,20 +246,27 @@ def dashboard(request: Request, category: str | None = None, session: Session =
             key=lambda topic: (-ranked_map.get(topic, 0), topic),
         )[:6]
 
-    # Summaries
-    categories = []
-    for k, v in ranked:
-        categories.append(
-            {
-                "name": k,
-                "count": v,
-                "conversations": conversation_map.get(k, []),
-            }
-        )
     if category:
-        categories = [c for c in categories if c["name"] == category]
+        ranked = [(k, v) for k, v in ranked if k == category]
     elif user_topics:
-        categories = [c for c in categories if c["name"] in user_topics]
+        ranked = [(k, v) for k, v in ranked if k in user_topics]
+
+    # Published topics come straight from their digest fragment; the rest are rendered live
+    digests = {
+        d.topic: d
+        for d in session.exec(select(TopicDigest).where(TopicDigest.topic.in_([k for k, _ in ranked]))).all()
+    }
+    fragments = {}
+    for name, digest in digests.items():
+        frag_html = read_fragment(name, digest.version)
+        if frag_html is not None:
+            fragments[name] = frag_html
+    live = category_views(session, {k: v for k, v in ranked if k not in fragments})
+    live_map = {c["name"]: c for c in live}
+    categories = [
+        {"name": k, "count": v, "fragment": fragments[k]} if k in fragments else live_map[k]
+        for k, v in ranked
+    ]
 
     return render(
         request,
@@ -426,6 +278,61 @@ def dashboard(request: Request, category: str | None = None, session: Session =
             "msg": request.query_params.get("msg"),
             "user_topics": user_topics,
             "featured_topics": featured_topics,
+            "stale_sources": stale_sources,
+            "ingest_jobs": latest_jobs(session, user_topics),
+        },
+    )
+
+
+@app.get("/digests/{slug}/{name}")
+def digest_file(request: Request, slug: str, name: str):
+    """
+    Published topic snapshots (app/digests.py). Names are content hashes, so
+    responses are cacheable forever; nginx or a CDN can serve the same files.
+    """
+    if not DIGEST_NAME_RE.match(name) or slug != topic_slug(slug):
+        return Response(status_code=404)
+    path, encoding = pick_encoding(digest_path(slug, name), request.headers.get("accept-encoding", ""))
+    if not os.path.exists(path):
+        return Response(status_code=404)
+    headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(path, media_type=FORMATS[name.rsplit(".", 1)[1]], headers=headers)
+
+
+@app.get("/search", response_class=HTMLResponse)
+def search_page(
+    request: Request,
+    q: str = "",
+    after: str | None = None,
+    category: str | None = None,
+    session: Session = Depends(get_session),
+):
+    """
+    Full-text search over what we already hold; never calls upstream sources.
+    """
+    user = get_current_user(request, session)
+    if not user:
+        return RedirectResponse("/login", status_code=302)
+
+    hits, next_cursor = search(session, q, after=after, category=category)
+    next_url = None
+    if next_cursor:
+        params = {"q": q, "after": next_cursor}
+        if category:
+            params["category"] = category
+        next_url = "/search?" + urlencode(params)
+
+    return render(
+        request,
+        "search.html",
+        {
+            "user": user,
+            "q": q,
+            "category": category,
+            "hits": hits,
+            "next_url": next_url,
         },
     )
 
@@ -437,7 +344,8 @@ async def ingest_all(
     session: Session = Depends(get_session),
 ):
     """
-    One button: ingests Reddit conversations + optional X recent search, then updates AI summaries.
+    One button: queues an ingest (Reddit conversations + optional X recent search,
+    then AI summaries) per topic for the workers.
     """
     user = get_current_user(request, session)
     if not user:
@@ -446,166 +354,16 @@ async def ingest_all(
     topic_list = [topic.strip() for topic in topics.split(",") if topic.strip()]
     if not topic_list:
         return RedirectResponse("/dashboard?msg=Add+at+least+one+topic", status_code=302)
-    inserted_reddit = 0
-    inserted_x = 0
-    x_status = None
-
-    # Reset previous ingest results so categories match requested topics
-    session.exec(delete(CategorySummary))
-    session.exec(delete(ConversationSummary))
-    session.exec(delete(Post))
-    session.commit()
-
-    x_category = topic_list[0].lower() if len(topic_list) == 1 else "mixed"
-
-    # --- Ingest (avoid premature autoflush during big loops) ---
-    with session.no_autoflush:
-        # Reddit
-        for topic in topic_list:
-            seen_ids = set()
-            for sort in ("hot", "new", "top"):
-                posts = await fetch_reddit_search(
-                    topic,
-                    sort=sort,
-                    limit=50,
-                    conversations_only=True,
-                )
-                for p in posts:
-                    source_id = p["source_id"]
-                    if source_id in seen_ids:
-                        continue
-                    seen_ids.add(source_id)
-
-                    existing = session.exec(
-                        select(Post).where(Post.source == "reddit", Post.source_id == source_id)
-                    ).first()
-                    if existing:
-                        continue
-
-                    cat = topic.lower()
-                    session.add(
-                        Post(
-                            source="reddit",
-                            source_id=source_id,
-                            category=cat,
-                            title=p["title"],
-                            url=p["url"],
-                            author=p.get("author"),
-                            created_utc=p["created_utc"],
-                            score=p["score"],
-                            num_comments=p["num_comments"],
-                            heat_score=compute_heat(p["score"], p["num_comments"], p["created_utc"]),
-                        )
-                    )
-                    inserted_reddit += 1
-
-        # X (optional)
-        if topic_list and settings.x_bearer_token:
-            try:
-                x_query = " OR ".join(topic_list)
-                raw = await fetch_x_recent(
-                    query=x_query.strip(),
-                    bearer_token=settings.x_bearer_token,
-                    max_results=25,
-                )
-                now = int(time.time())
-                for p in raw:
-                    existing = session.exec(
-                        select(Post).where(Post.source == "x", Post.source_id == p["source_id"])
-                    ).first()
-                    if existing:
-                        continue
-
-                    cat = x_category
-                    session.add(
-                        Post(
-                            source="x",
-                            source_id=p["source_id"],
-                            category=cat,
-                            title=p["title"],
-                            url=p["url"],
-                            author=p.get("author"),
-                            created_utc=now,
-                            score=p["score"],
-                            num_comments=p["num_comments"],
-                            heat_score=compute_heat(p["score"], p["num_comments"], now),
-                        )
-                    )
-                    inserted_x += 1
-            except httpx.HTTPStatusError as exc:
-                x_status = f"X skipped ({exc.response.status_code})"
-            except httpx.RequestError:
-                x_status = "X skipped (network error)"
-
-    # Commit inserts first
-    session.commit()
-
-    # --- AI summaries (no tiers in-build; later we’ll gate behind Stripe paid) ---
-    try:
-        categories = session.exec(select(Post.category)).all()
-        unique = sorted(set([c for c in categories if c]))
-
-        for cat in unique:
-            titles = [
-                p.title
-                for p in session.exec(
-                    select(Post)
-                    .where(Post.category == cat)
-                    .order_by(Post.heat_score.desc())
-                    .limit(30)
-                ).all()
-            ]
-            if not titles:
-                continue
-
-            summary = summarize_category(cat, titles)
-            row = session.exec(select(CategorySummary).where(CategorySummary.category == cat)).first()
-
-            if row:
-                row.summary = summary
-                row.updated_at = datetime.utcnow()
-                session.add(row)
-            else:
-                session.add(CategorySummary(category=cat, summary=summary))
-
-        session.commit()
-        summary_status = "Summaries updated"
-    except Exception:
-        # Don’t break ingestion if OpenAI isn’t configured yet
-        summary_status = "Summaries skipped (check OPENAI_API_KEY)"
-
-    # --- Conversation summaries ---
-    categories = session.exec(select(Post.category)).all()
-    unique = sorted(set([c for c in categories if c]))
-    for cat in unique:
-        top_posts = session.exec(
-            select(Post)
-            .where(Post.category == cat, Post.source == "reddit")
-            .order_by(Post.heat_score.desc())
-            .limit(MAX_CONVERSATIONS_PER_TOPIC)
-        ).all()
-        for idx, post in enumerate(top_posts):
-            comments = await fetch_reddit_comments(post.source_id, limit=6)
-            summary = summarize_post(post.title, comments)
-            session.add(
-                ConversationSummary(
-                    category=cat,
-                    post_url=post.url,
-                    summary=summary,
-                    position=idx,
-                )
-            )
-    session.commit()
-
-    if x_status:
-        msg = (
-            f"Ingested {inserted_reddit} Reddit + {inserted_x} X posts • "
-            f"{summary_status} • {x_status}"
-        )
+    # Workers (python -m app.worker) do the actual ingest. Cancel jobs for
+    # removed topics first, so a running one can't write after the reset that
+    # makes categories match the requested topics.
+    queued = enqueue_ingest(session, topic_list)
+    clear_topics_except(session, topic_list)
+    if queued:
+        msg = f"Ingest queued for {', '.join(queued)}"
     else:
-        msg = f"Ingested {inserted_reddit} Reddit + {inserted_x} X posts • {summary_status}"
-    msg_param = quote_plus(msg)
-    redirect_url = f"/dashboard?msg={msg_param}"
+        msg = "Ingest already queued"
+    redirect_url = f"/dashboard?msg={quote_plus(msg)}"
     if len(topic_list) == 1:
         redirect_url += f"&category={quote_plus(topic_list[0].lower())}"
     resp = RedirectResponse(redirect_url, status_code=302)
@@ -632,9 +390,9 @@ async def ingest_all(
 
 
 @app.get("/billing/checkout")
-def billing_checkout(request: Request, session: Session = Depends(get_session)):
+async def billing_checkout(request: Request, session: Session = Depends(get_session)):
     """
-    Stripe checkout. (Webhook activation still TBD)
+    Stripe checkout for the signed-in user, reusing their Stripe customer.
     """
     user = get_current_user(request, session)
     if not user:
@@ -643,17 +401,41 @@ def billing_checkout(request: Request, session: Session = Depends(get_session)):
     if not settings.stripe_secret_key or not settings.stripe_price_id:
         return RedirectResponse("/dashboard?msg=Stripe+not+configured", status_code=302)
 
-    url = create_checkout_session(
-        customer_email=user.email,
-        success_url=f"{settings.base_url}/billing/success",
-        cancel_url=f"{settings.base_url}/pricing",
-    )
+    # Stripe calls block; keep them off the event loop and bounded by their own limiter
+    try:
+        url = await anyio.to_thread.run_sync(
+            start_checkout,
+            user.id,
+            f"{settings.base_url}/billing/success",
+            f"{settings.base_url}/pricing",
+            limiter=STRIPE_LIMITER,
+        )
+    except stripe_errors():
+        log.exception("checkout failed for user %s", user.id)
+        return RedirectResponse("/dashboard?msg=Checkout+unavailable,+try+again+shortly", status_code=302)
     return RedirectResponse(url, status_code=303)
 
 
 @app.get("/billing/success")
 def billing_success():
     return RedirectResponse(
-        "/dashboard?msg=Payment+received.+Webhook+activation+coming+next",
+        "/dashboard?msg=Payment+received.+Your+subscription+activates+in+a+moment",
         status_code=302,
     )
+
+
+@app.post("/billing/webhook")
+async def billing_webhook(request: Request, session: Session = Depends(get_session)):
+    """
+    Stripe webhook: verify, store, acknowledge. Workers apply the event.
+    """
+    if not settings.stripe_webhook_secret:
+        return Response("webhook not configured", status_code=503)
+    payload = await request.body()
+    signature = request.headers.get("stripe-signature", "")
+    try:
+        # Verifying may import stripe on first use; keep that off the event loop
+        stored = await anyio.to_thread.run_sync(record_event, session, payload, signature)
+    except (ValueError, get_stripe().SignatureVerificationError):
+        return Response("invalid payload or signature", status_code=400)
+    return Response("ok" if stored else "duplicate", status_code=200)
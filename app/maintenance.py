@@ -0,0 +1,290 @@
+"""
+Database upkeep: retention pruning, WAL checkpoint and incremental vacuum.
+
+Workers run it once a day inside the off-peak window (settings.maintenance_hour_utc)
+when they have nothing else to do; it can also be run by hand.
+
+    python -m app.maintenance            # run now
+    python -m app.maintenance --report   # recent runs
+"""
+import argparse
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from .db import engine, init_db
+from .digests import topic_slug
+from .jobs import CANCELLED, DONE, FAILED
+from .models import (
+    CategoryAngle,
+    CommentCache,
+    ConversationSummary,
+    IngestJob,
+    IngestRun,
+    LLMUsage,
+    MaintenanceRun,
+    Post,
+    StripeEvent,
+    TopicDigest,
+)
+from .records import dumps, loads
+from .settings import settings
+from .stripe_billing import PENDING, PROCESSING
+
+DELETE_BATCH = 500
+WINDOW_HOURS = 3
+# Old digest versions may still be referenced by cached pages for a while
+DIGEST_GRACE = timedelta(days=1)
+
+
+def _db_path() -> Optional[str]:
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        return None
+    return database
+
+
+def file_sizes() -> Dict[str, int]:
+    path = _db_path()
+    if not path:
+        return {"db": 0, "wal": 0}
+    sizes = {}
+    for key, name in (("db", path), ("wal", path + "-wal")):
+        try:
+            sizes[key] = os.path.getsize(name)
+        except OSError:
+            sizes[key] = 0
+    return sizes
+
+
+def _delete_batched(session: Session, model, *conditions) -> int:
+    """
+    Deletes in small batches so a big purge never holds the write lock for long.
+    """
+    total = 0
+    while True:
+        ids = select(model.id).where(*conditions).limit(DELETE_BATCH)
+        deleted = session.exec(delete(model).where(model.id.in_(ids))).rowcount
+        session.commit()
+        total += deleted
+        if deleted < DELETE_BATCH:
+            return total
+
+
+def prune(session: Session, now: datetime) -> Dict[str, int]:
+    """
+    Drops rows past their retention and posts beyond each topic's cap.
+    Returns rows deleted per table.
+    """
+    cutoff = now - timedelta(days=settings.retention_days)
+    usage_cutoff = now - timedelta(days=settings.usage_retention_days)
+    deleted = {
+        "post": _delete_batched(session, Post, Post.fetched_at < cutoff),
+        "conversationsummary": _delete_batched(session, ConversationSummary, ConversationSummary.created_at < cutoff),
+        "categoryangle": _delete_batched(session, CategoryAngle, CategoryAngle.created_at < cutoff),
+        "commentcache": _delete_batched(session, CommentCache, CommentCache.fetched_at < cutoff),
+        "ingestjob": _delete_batched(
+            session,
+            IngestJob,
+            IngestJob.status.in_([DONE, FAILED, CANCELLED]),
+            IngestJob.created_at < cutoff,
+        ),
+        # Stripe stops redelivering after three days; older ids can't come back
+        "stripeevent": _delete_batched(
+            session,
+            StripeEvent,
+            StripeEvent.status.not_in([PENDING, PROCESSING]),
+            StripeEvent.received_at < cutoff,
+        ),
+        "llmusage": _delete_batched(session, LLMUsage, LLMUsage.created_at < usage_cutoff),
+        "ingestrun": _delete_batched(session, IngestRun, IngestRun.started_at < usage_cutoff),
+    }
+
+    # Per-topic cap: keep the hottest posts
+    ranked = select(
+        Post.id,
+        func.row_number()
+        .over(partition_by=Post.category, order_by=(Post.heat_score.desc(), Post.id.desc()))
+        .label("rank"),
+    ).subquery()
+    deleted["post"] += _delete_batched(
+        session,
+        Post,
+        Post.id.in_(select(ranked.c.id).where(ranked.c.rank > settings.max_posts_per_topic)),
+    )
+    return deleted
+
+
+def prune_digest_files(session: Session, now: datetime) -> int:
+    """
+    Removes digest versions that are no longer current. Returns bytes freed.
+    """
+    root = settings.digest_dir
+    if not os.path.isdir(root):
+        return 0
+    current = {topic_slug(d.topic): d.version for d in session.exec(select(TopicDigest)).all()}
+    cutoff = (now - DIGEST_GRACE).timestamp()
+    freed = 0
+    for slug in os.listdir(root):
+        folder = os.path.join(root, slug)
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if name.split(".", 1)[0] == current.get(slug) or os.path.getmtime(path) > cutoff:
+                continue
+            freed += os.path.getsize(path)
+            os.remove(path)
+        if slug not in current and not os.listdir(folder):
+            shutil.rmtree(folder, ignore_errors=True)
+    return freed
+
+
+def vacuum(page_budget: int) -> Dict[str, int]:
+    """
+    Hands up to `page_budget` free pages back to the filesystem. A file created
+    before incremental auto-vacuum was enabled is converted first (one full VACUUM).
+    """
+    if not _db_path():
+        return {}
+    # VACUUM can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        converted = 0
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+            conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+            converted = 1
+        free_before = conn.execute(text("PRAGMA freelist_count")).scalar()
+        # Python's sqlite3 steps this pragma only once, which frees a single
+        # page, so ask for one page at a time inside one transaction
+        conn.execute(text("BEGIN"))
+        for _ in range(min(page_budget, free_before)):
+            conn.execute(text("PRAGMA incremental_vacuum(1)"))
+        conn.execute(text("COMMIT"))
+        free_after = conn.execute(text("PRAGMA freelist_count")).scalar()
+    return {
+        "converted": converted,
+        "pages_freed": free_before - free_after,
+        "pages_left": free_after,
+    }
+
+
+def checkpoint() -> Dict[str, int]:
+    """
+    Copies the WAL into the database and truncates it to zero bytes.
+    """
+    if not _db_path():
+        return {}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        busy, log_frames, checkpointed = conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)")).one()
+    return {"busy": busy, "log_frames": log_frames, "checkpointed": checkpointed}
+
+
+def run_maintenance(slot: Optional[str] = None) -> Optional[MaintenanceRun]:
+    """
+    One full pass. With a `slot`, returns None if another worker already
+    claimed it.
+    """
+    with Session(engine) as session:
+        run = MaintenanceRun(slot=slot)
+        session.add(run)
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return None
+        session.refresh(run)
+
+        now = datetime.utcnow()
+        before = file_sizes()
+        timings = {}
+
+        start = time.perf_counter()
+        deleted = prune(session, now)
+        digest_bytes = prune_digest_files(session, now)
+        timings["prune"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # Checkpoint first so freed pages sit in the main file where vacuum can release them
+        checkpoint()
+        vacuumed = vacuum(settings.vacuum_pages_per_run)
+        timings["vacuum"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        checkpointed = checkpoint()
+        timings["checkpoint"] = time.perf_counter() - start
+
+        after = file_sizes()
+        reclaimed = sum(before.values()) - sum(after.values())
+        run.bytes_reclaimed = reclaimed + digest_bytes
+        run.report = dumps(
+            {
+                "timings_ms": {k: round(v * 1000, 1) for k, v in timings.items()},
+                "deleted": deleted,
+                "vacuum": vacuumed,
+                "checkpoint": checkpointed,
+                "before": before,
+                "after": after,
+                "digest_bytes": digest_bytes,
+            }
+        )
+        run.finished_at = datetime.utcnow()
+        session.add(run)
+        session.commit()
+        session.refresh(run)
+        return run
+
+
+def in_window(now: datetime) -> bool:
+    return (now.hour - settings.maintenance_hour_utc) % 24 < WINDOW_HOURS
+
+
+def maybe_run_maintenance(now: Optional[datetime] = None) -> Optional[MaintenanceRun]:
+    """
+    Runs today's maintenance if we're in the off-peak window and no worker has yet.
+    """
+    now = now or datetime.utcnow()
+    if not in_window(now):
+        return None
+    # The window may span midnight; name the slot after the day it opened
+    opened = now - timedelta(hours=(now.hour - settings.maintenance_hour_utc) % 24)
+    slot = opened.strftime("%Y-%m-%d")
+    with Session(engine) as session:
+        if session.exec(select(MaintenanceRun.id).where(MaintenanceRun.slot == slot)).first():
+            return None
+    return run_maintenance(slot)
+
+
+def format_run(run: MaintenanceRun) -> str:
+    report = loads(run.report) if run.report else {}
+    timings = report.get("timings_ms", {})
+    deleted = {k: v for k, v in report.get("deleted", {}).items() if v}
+    vacuumed = report.get("vacuum", {})
+    return (
+        f"#{run.id} {run.started_at:%Y-%m-%d %H:%M} {run.slot or 'manual':<10} "
+        f"reclaimed {run.bytes_reclaimed / 1024:,.0f} KiB · "
+        + " ".join(f"{k} {v:.0f}ms" for k, v in timings.items())
+        + f" · pages freed {vacuumed.get('pages_freed', 0)}"
+        + (" (converted to incremental)" if vacuumed.get("converted") else "")
+        + (f" · deleted {deleted}" if deleted else "")
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="The Angle database maintenance")
+    parser.add_argument("--report", action="store_true", help="show recent runs instead of running")
+    args = parser.parse_args()
+    init_db()
+
+    if args.report:
+        with Session(engine) as session:
+            runs = session.exec(select(MaintenanceRun).order_by(MaintenanceRun.id.desc()).limit(14)).all()
+        print("\n".join(format_run(r) for r in runs) or "No maintenance runs yet")
+    else:
+        print(format_run(run_maintenance()))
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Column
 from datetime import datetime
 from typing import Optional
@@ -10,10 +11,18 @@ class User(SQLModel, table=True):
     stripe_customer_id: Optional[str] = None
     stripe_subscription_id: Optional[str] = None
     is_active_subscriber: bool = False
+    stripe_event_at: Optional[int] = None  # `created` of the last webhook event applied
 
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Post(SQLModel, table=True):
+    # Keyset pagination for /api/posts walks (category, heat_score, id), or
+    # (heat_score, id) when no category is given
+    __table_args__ = (
+        Index("ix_post_category_heat", "category", "heat_score", "id"),
+        Index("ix_post_heat", "heat_score", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     source: str  # reddit | x | linkedin
@@ -28,21 +37,51 @@ class Post(SQLModel, table=True):
     score: int = 0
     num_comments: int = 0
     heat_score: float = 0.0
+    # "source:source_id" of the cluster representative when this is a near-duplicate
+    duplicate_of: Optional[str] = Field(default=None, index=True)
+    angle_id: Optional[int] = Field(default=None, index=True)
+    stale: bool = False  # kept from an earlier ingest while its source was unavailable
 
     fetched_at: datetime = Field(default_factory=datetime.utcnow)
 
+class CommentCache(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    post_id: str = Field(index=True, unique=True)  # Reddit post id
+    num_comments: int = 0  # the post's comment count when we fetched
+    comments: str  # JSON list of [body, score]
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
+
 class CategorySummary(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     category: str = Field(index=True, unique=True)
     summary: str
+    stale: bool = False
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class CategoryAngle(SQLModel, table=True):
+    """
+    A sub-theme of a category found by local TF-IDF clustering (app/angles.py).
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    category: str = Field(index=True)
+    label: str
+    terms: str  # comma separated, most representative first
+    size: int = 0
+    position: int = 0
+    lead_url: str
+    lead_title: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 class ConversationSummary(SQLModel, table=True):
+    __table_args__ = (Index("ix_conversationsummary_category_position", "category", "position", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     category: str = Field(index=True)
     post_url: str
     summary: str
     position: int = 0
+    cluster_key: Optional[str] = None
+    stale: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -51,3 +90,105 @@ class UserTopic(SQLModel, table=True):
     user_id: int = Field(index=True, foreign_key="user.id")
     topic: str = Field(index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class XSearchCursor(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    query: str = Field(index=True, unique=True)
+    newest_id: str  # passed as since_id so repeat runs only fetch newer tweets
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class IngestRun(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    topics: str  # comma separated
+    batch_id: Optional[str] = Field(default=None, index=True)  # IngestJob.batch_id
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+
+class LLMUsage(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: Optional[int] = Field(default=None, index=True)
+    kind: str  # category | post
+    category: str = Field(index=True)
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: float = 0.0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class IngestJob(SQLModel, table=True):
+    """
+    One topic waiting to be ingested by a worker (app/worker.py). A running job
+    belongs to `lease_owner` until `lease_expires_at`; the owner keeps pushing
+    that forward, so a job whose lease lapsed was abandoned and can be reclaimed.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # "topic": Reddit + summaries for one topic; "x": the combined X search for
+    # the batch (`topic` then holds the batch's topics, comma separated)
+    kind: str = Field(default="topic", index=True)
+    topic: str = Field(index=True)
+    # Jobs queued together; a batch's topic jobs wait for its X job
+    batch_id: Optional[str] = Field(default=None, index=True)
+    status: str = Field(default="queued", index=True)  # queued | running | done | failed | cancelled
+    attempts: int = 0
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = Field(default=None, index=True)
+    heartbeat_at: Optional[datetime] = None
+    message: Optional[str] = None  # status line for the dashboard
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class ContentVersion(SQLModel, table=True):
+    """
+    Counter bumped when stored results are removed outside an ingest (topics
+    cleared), so the API's ETags (app/api.py) change with them.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class TopicDigest(SQLModel, table=True):
+    """
+    Current published snapshot of a topic (app/digests.py); files live under
+    settings.digest_dir/<topic slug>/<version>.{json,html}.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    topic: str = Field(index=True, unique=True)
+    version: str
+    post_count: int = 0
+    published_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MaintenanceRun(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # Scheduled runs claim their day here so only one worker runs them; manual runs leave it empty
+    slot: Optional[str] = Field(default=None, unique=True)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    bytes_reclaimed: int = 0
+    report: Optional[str] = None  # JSON: step timings, rows deleted, file sizes
+
+
+class StripeEvent(SQLModel, table=True):
+    """
+    A verified Stripe webhook event (app/stripe_billing.py). The unique event id
+    makes redeliveries no-ops; workers apply pending events to users.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    event_id: str = Field(index=True, unique=True)
+    type: str
+    created: int = Field(default=0, index=True)  # Stripe's timestamp, for ordering
+    payload: str  # the raw JSON body
+    status: str = Field(default="pending", index=True)  # pending | processing | done | ignored | failed
+    attempts: int = 0
+    error: Optional[str] = None
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+    claimed_at: Optional[datetime] = None
+    processed_at: Optional[datetime] = None
@@ -0,0 +1,36 @@
+import json
+from typing import NamedTuple, Optional
+
+try:  # orjson is several times faster than the stdlib on large listing pages
+    import orjson
+
+    def loads(raw: bytes):
+        return orjson.loads(raw)
+
+    def dumps(value) -> str:
+        return orjson.dumps(value).decode()
+except ImportError:  # pragma: no cover - optional speedup
+    def loads(raw: bytes):
+        return json.loads(raw)
+
+    def dumps(value) -> str:
+        return json.dumps(value, separators=(",", ":"))
+
+
+class PostRecord(NamedTuple):
+    """
+    The handful of fields ingest actually reads from a Reddit post or tweet.
+    """
+    source: str
+    source_id: str
+    title: str
+    url: str
+    author: Optional[str]
+    created_utc: int
+    score: int
+    num_comments: int
+
+
+class CommentRecord(NamedTuple):
+    body: str
+    score: int
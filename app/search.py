@@ -0,0 +1,149 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlmodel import Session
+
+from .db import engine
+
+PAGE_SIZE = 20
+SNIPPET_TOKENS = 16
+# Control characters can't appear in the indexed text, so they safely mark
+# highlights until the snippet has been HTML-escaped.
+_HL_START, _HL_END = "\x02", "\x03"
+
+# External-content FTS5 tables: the text lives in post/conversationsummary only,
+# the index is kept in sync by triggers.
+FTS_TABLES = {
+    "post_fts": ("post", "title"),
+    "conversation_fts": ("conversationsummary", "summary"),
+}
+
+
+def _fts_ddl(fts: str, table: str, column: str) -> List[str]:
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def init_search_index() -> None:
+    """
+    Creates the FTS5 tables and sync triggers, indexing existing rows the first time.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for fts, (table, column) in FTS_TABLES.items():
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": fts},
+            ).first()
+            if exists:
+                continue
+            for ddl in _fts_ddl(fts, table, column):
+                conn.execute(text(ddl))
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+class SearchHit(NamedTuple):
+    kind: str  # post | conversation
+    id: int
+    rank: float
+    category: str
+    url: str
+    snippet: Markup
+
+
+def fts_query(q: str) -> str:
+    """
+    Quotes each word so user input can't trip FTS5 query syntax; words are ANDed.
+    """
+    words = re.findall(r"\w+", q or "")
+    return " ".join(f'"{w}"' for w in words)
+
+
+def encode_cursor(hit: SearchHit) -> str:
+    return f"{hit.rank!r}:{hit.kind}:{hit.id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[float, str, int]]:
+    try:
+        rank, kind, id_ = (cursor or "").split(":")
+        return float(rank), kind, int(id_)
+    except ValueError:
+        return None
+
+
+def _highlight(snippet: str) -> Markup:
+    return Markup(
+        str(escape(snippet)).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+    )
+
+
+SEARCH_SQL = f"""
+SELECT kind, id, rank, category, url, snip FROM (
+    SELECT 'post' AS kind, post.id AS id, bm25(post_fts) AS rank,
+           post.category AS category, post.url AS url,
+           snippet(post_fts, 0, :hs, :he, '…', {SNIPPET_TOKENS}) AS snip
+    FROM post_fts JOIN post ON post.id = post_fts.rowid
+    WHERE post_fts MATCH :q AND post.duplicate_of IS NULL
+    UNION ALL
+    SELECT 'conversation', c.id, bm25(conversation_fts),
+           c.category, c.post_url,
+           snippet(conversation_fts, 0, :hs, :he, '…', {SNIPPET_TOKENS})
+    FROM conversation_fts JOIN conversationsummary c ON c.id = conversation_fts.rowid
+    WHERE conversation_fts MATCH :q
+)
+WHERE (:category IS NULL OR category = :category)
+  AND (:after_rank IS NULL OR (rank, kind, id) > (:after_rank, :after_kind, :after_id))
+ORDER BY rank, kind, id
+LIMIT :limit
+"""
+
+
+def search(
+    session: Session,
+    q: str,
+    after: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+) -> Tuple[List[SearchHit], Optional[str]]:
+    """
+    BM25-ranked matches across post titles and conversation summaries.
+    Returns one page of hits plus the cursor for the next page (None on the last page).
+    """
+    match = fts_query(q)
+    if not match or engine.dialect.name != "sqlite":
+        return [], None
+
+    after_rank, after_kind, after_id = decode_cursor(after) or (None, None, None)
+    rows = session.execute(
+        text(SEARCH_SQL),
+        {
+            "q": match,
+            "hs": _HL_START,
+            "he": _HL_END,
+            "category": category or None,
+            "after_rank": after_rank,
+            "after_kind": after_kind,
+            "after_id": after_id,
+            # One extra row tells us whether there is a next page
+            "limit": limit + 1,
+        },
+    ).all()
+
+    hits = [
+        SearchHit(kind, id_, rank, category, url, _highlight(snip))
+        for kind, id_, rank, category, url, snip in rows[:limit]
+    ]
+    next_cursor = encode_cursor(hits[-1]) if len(rows) > limit else None
+    return hits, next_cursor
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pydantic_settings import BaseSettings
 
 def resolve_db_url() -> str:
@@ -9,12 +10,25 @@ def resolve_db_url() -> str:
         return "sqlite:////var/data/theangle.db"
     return "sqlite:///./theangle.db"
 
+def resolve_digest_dir() -> str:
+    explicit_path = os.getenv("THEANGLE_DB_PATH") or os.getenv("RENDER_DISK_PATH")
+    if explicit_path:
+        return f"{explicit_path.rstrip('/')}/digests"
+    if os.path.isdir("/var/data"):
+        return "/var/data/digests"
+    return "./digests"
+
 DEFAULT_DB_URL = resolve_db_url()
+DEFAULT_DIGEST_DIR = resolve_digest_dir()
 
 class Settings(BaseSettings):
     app_secret: str
     db_url: str = DEFAULT_DB_URL
     base_url: str = "http://127.0.0.1:8000"
+    # Published per-topic snapshots; share it between web and worker nodes
+    digest_dir: str = DEFAULT_DIGEST_DIR
+    # Compiled Jinja templates; per node, safe to delete
+    jinja_cache_dir: str = os.path.join(tempfile.gettempdir(), "theangle-jinja")
 
     openai_api_key: str = ""
 
@@ -22,8 +36,21 @@ class Settings(BaseSettings):
     stripe_publishable_key: str = ""
     stripe_webhook_secret: str = ""
     stripe_price_id: str = ""
+    stripe_api_base: str = ""  # e.g. http://localhost:12111 for stripe-mock; empty means api.stripe.com
+
+    # Cached Reddit comments are reused until the post gains this many comments or the entry ages out
+    comment_refetch_delta: int = 10
+    comment_cache_ttl_hours: int = 24
+
+    # Maintenance (app/maintenance.py): retention, WAL checkpoint, incremental vacuum
+    retention_days: int = 14
+    max_posts_per_topic: int = 2000
+    usage_retention_days: int = 90  # IngestRun / LLMUsage history for the usage report
+    vacuum_pages_per_run: int = 5000
+    maintenance_hour_utc: int = 4  # start of the off-peak window
 
     x_bearer_token: str = ""
+    x_max_results: int = 100  # per-ingest tweet budget across next_token pages
 
     class Config:
         env_file = ".env"
@@ -1,9 +1,97 @@
-import stripe
+"""
+Stripe checkout and subscription webhooks.
+
+The web tier only talks to Stripe from worker threads (see billing_checkout in
+main.py), with a short timeout. Webhook events are verified, stored in the
+StripeEvent table and acknowledged; workers (app/worker.py) apply them to users,
+so a burst of Stripe retries costs one insert each.
+
+For local testing point STRIPE_API_BASE at a stub such as stripe-mock.
+"""
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import StripeEvent, User
 from .settings import settings
 
-stripe.api_key = settings.stripe_secret_key
+STRIPE_TIMEOUT_SECONDS = 10
+STRIPE_NETWORK_RETRIES = 1
+# Stripe calls in flight per web process; the rest wait rather than take every thread
+STRIPE_CONCURRENCY = 8
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+IGNORED = "ignored"
+FAILED = "failed"
+
+MAX_EVENT_ATTEMPTS = 5
+# A claimed event whose worker died is retried after this long
+EVENT_CLAIM_SECONDS = 60
+EVENT_BATCH = 20
+
+ACTIVE_STATUSES = {"active", "trialing"}
+SUBSCRIPTION_EVENTS = {
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+}
+
+
+@lru_cache(maxsize=1)
+def get_stripe():
+    """
+    The stripe module, imported and configured on first use; it's a slow import
+    that most requests never need.
+    """
+    import stripe
+
+    stripe.api_key = settings.stripe_secret_key
+    if settings.stripe_api_base:
+        stripe.api_base = settings.stripe_api_base
+    stripe.default_http_client = stripe.HTTPXClient(timeout=STRIPE_TIMEOUT_SECONDS, allow_sync_methods=True)
+    # Retries reuse an idempotency key, so they can't create a second object
+    stripe.max_network_retries = STRIPE_NETWORK_RETRIES
+    return stripe
 
-def create_checkout_session(customer_email: str, success_url: str, cancel_url: str) -> str:
+
+def stripe_errors() -> tuple:
+    """
+    What a Stripe call can raise when Stripe is slow, down or refuses the request.
+    """
+    return (get_stripe().StripeError, ValueError)
+
+
+def get_or_create_customer(session: Session, user: User) -> str:
+    """
+    The user's Stripe customer id, creating and storing the customer the first time.
+    """
+    if user.stripe_customer_id:
+        return user.stripe_customer_id
+    customer = get_stripe().Customer.create(
+        email=user.email,
+        metadata={"user_id": str(user.id)},
+        # Two checkouts racing for a new user get the same customer back
+        idempotency_key=f"customer-{user.id}",
+    )
+    session.exec(
+        update(User)
+        .where(User.id == user.id, User.stripe_customer_id.is_(None))
+        .values(stripe_customer_id=customer.id)
+    )
+    session.commit()
+    session.refresh(user)
+    return user.stripe_customer_id
+
+
+def create_checkout_session(customer_id: str, user_id: int, success_url: str, cancel_url: str) -> str:
     """
     Creates a subscription checkout session using STRIPE_PRICE_ID.
     Returns session URL to redirect the user.
@@ -11,13 +99,149 @@ def create_checkout_session(customer_email: str, success_url: str, cancel_url: s
     if not settings.stripe_price_id:
         raise ValueError("STRIPE_PRICE_ID not set")
 
-    session = stripe.checkout.Session.create(
+    session = get_stripe().checkout.Session.create(
         mode="subscription",
         payment_method_types=["card"],
-        customer_email=customer_email,
+        customer=customer_id,
+        client_reference_id=str(user_id),
         line_items=[{"price": settings.stripe_price_id, "quantity": 1}],
         success_url=success_url,
         cancel_url=cancel_url,
     )
     return session.url
 
+
+def start_checkout(user_id: int, success_url: str, cancel_url: str) -> str:
+    """
+    Customer lookup/creation plus the checkout session, in one blocking call
+    meant for a worker thread (it opens its own database session).
+    """
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        customer_id = get_or_create_customer(session, user)
+    return create_checkout_session(customer_id, user_id, success_url, cancel_url)
+
+
+# --- Webhooks ---
+
+
+def record_event(session: Session, payload: bytes, signature: str) -> bool:
+    """
+    Verifies a webhook delivery and stores its event for the workers. Returns
+    False for an event we already have (Stripe redelivers). Raises ValueError or
+    stripe.SignatureVerificationError for a payload that isn't from Stripe.
+    """
+    stripe = get_stripe()
+    event = stripe.Webhook.construct_event(payload, signature, settings.stripe_webhook_secret)
+    session.add(
+        StripeEvent(
+            event_id=event["id"],
+            type=event["type"],
+            created=event.get("created") or 0,
+            payload=payload.decode("utf-8"),
+        )
+    )
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        return False
+    return True
+
+
+def _claimable(now: datetime):
+    return and_(
+        StripeEvent.attempts < MAX_EVENT_ATTEMPTS,
+        or_(
+            StripeEvent.status == PENDING,
+            and_(
+                StripeEvent.status == PROCESSING,
+                StripeEvent.claimed_at < now - timedelta(seconds=EVENT_CLAIM_SECONDS),
+            ),
+        ),
+    )
+
+
+def _find_user(session: Session, obj: dict) -> Optional[User]:
+    reference = obj.get("client_reference_id")
+    if reference and reference.isdigit():
+        user = session.get(User, int(reference))
+        if user:
+            return user
+    customer = obj.get("customer")
+    if not customer:
+        return None
+    return session.exec(select(User).where(User.stripe_customer_id == customer)).first()
+
+
+def apply_event(session: Session, event: StripeEvent) -> str:
+    """
+    Applies one stored event to its user. Returns the status to record. Events
+    can arrive out of order, so one older than the last applied for the user is skipped.
+    """
+    if event.type != "checkout.session.completed" and event.type not in SUBSCRIPTION_EVENTS:
+        return IGNORED
+    obj = json.loads(event.payload)["data"]["object"]
+    user = _find_user(session, obj)
+    if user is None:
+        event.error = "no matching user"
+        return IGNORED
+    if user.stripe_event_at and event.created < user.stripe_event_at:
+        event.error = "superseded"
+        return IGNORED
+
+    if event.type == "checkout.session.completed":
+        if obj.get("mode") != "subscription" or obj.get("status") != "complete":
+            return IGNORED
+        user.stripe_customer_id = user.stripe_customer_id or obj.get("customer")
+        user.stripe_subscription_id = obj.get("subscription")
+        user.is_active_subscriber = obj.get("payment_status") in ("paid", "no_payment_required")
+    elif event.type == "customer.subscription.deleted":
+        # Only the subscription we track can end access
+        if user.stripe_subscription_id not in (None, obj.get("id")):
+            return IGNORED
+        user.is_active_subscriber = False
+    else:
+        user.stripe_subscription_id = obj.get("id")
+        user.is_active_subscriber = obj.get("status") in ACTIVE_STATUSES
+    user.stripe_event_at = event.created
+    session.add(user)
+    return DONE
+
+
+def process_events(limit: int = EVENT_BATCH) -> int:
+    """
+    Claims and applies pending webhook events (compare-and-set, like ingest jobs,
+    so several workers can share the table). Returns how many were handled.
+    """
+    handled = 0
+    with Session(engine) as session:
+        now = datetime.utcnow()
+        candidates = session.exec(
+            select(StripeEvent.id)
+            .where(_claimable(now))
+            .order_by(StripeEvent.created, StripeEvent.id)
+            .limit(limit)
+        ).all()
+        for event_id in candidates:
+            claimed = session.exec(
+                update(StripeEvent)
+                .where(StripeEvent.id == event_id, _claimable(now))
+                .values(status=PROCESSING, claimed_at=now, attempts=StripeEvent.attempts + 1)
+            )
+            session.commit()
+            if claimed.rowcount != 1:
+                continue
+            event = session.get(StripeEvent, event_id)
+            try:
+                event.status = apply_event(session, event)
+                event.processed_at = datetime.utcnow()
+            except Exception as exc:
+                session.rollback()
+                event = session.get(StripeEvent, event_id)
+                event.status = PENDING if event.attempts < MAX_EVENT_ATTEMPTS else FAILED
+                event.error = f"{type(exc).__name__}: {exc}"[:500]
+            session.add(event)
+            session.commit()
+            handled += 1
+    return handled
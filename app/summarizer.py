@@ -1,14 +1,68 @@
-from openai import OpenAI
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+from .breaker import breaker
+from .records import CommentRecord
 from .settings import settings
 
-client = OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
+_client = None
 
-def summarize_category(category: str, titles: list[str]) -> str:
-    if not client:
-        return "OpenAI key not configured."
+MODEL = "gpt-4o-mini"
+# USD per 1M tokens, used for the usage report's cost estimate
+PROMPT_PRICE_PER_M = 0.15
+COMPLETION_PRICE_PER_M = 0.60
 
-    sample = "\n".join([f"- {t}" for t in titles[:30]])
-    prompt = f"""
+# Per-call prompt budgets (estimated tokens, instructions included)
+CATEGORY_PROMPT_BUDGET = 900
+POST_PROMPT_BUDGET = 700
+MAX_CATEGORY_TITLES = 30
+MAX_POST_COMMENTS = 6
+MAX_COMMENT_TOKENS = 120
+MIN_COMMENT_WORDS = 4
+SKIP_COMMENTS = {"[deleted]", "[removed]"}
+
+
+def get_client():
+    """
+    The OpenAI client, built on first use so processes that never summarize
+    don't pay for importing openai. None without an API key.
+    """
+    global _client
+    if _client is None and settings.openai_api_key:
+        from openai import OpenAI
+
+        # Fail within seconds and let the breaker decide when to try again,
+        # rather than sitting through the client's default retries.
+        _client = OpenAI(api_key=settings.openai_api_key, timeout=30.0, max_retries=1)
+    return _client
+
+
+class UsageRecord(NamedTuple):
+    kind: str  # category | post
+    category: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: float
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for English text (~4 characters per token).
+    """
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    # Cut on a word boundary so the model doesn't see half a word
+    return text[:limit].rsplit(" ", 1)[0].rstrip() + "…"
+
+
+def build_category_prompt(category: str, titles: Sequence[str], budget: int = CATEGORY_PROMPT_BUDGET) -> str:
+    header = f"""
 You are helping a journalist. Summarize what people are discussing in the category: {category}.
 Use only the list of conversation titles. Output:
 
@@ -17,38 +71,106 @@ Use only the list of conversation titles. Output:
 3) 5 suggested headlines
 
 Titles:
-{sample}
 """.strip()
+    remaining = budget - estimate_tokens(header)
+    lines = []
+    seen = set()
+    for title in titles[:MAX_CATEGORY_TITLES]:
+        title = " ".join((title or "").split())
+        if not title or title.lower() in seen:
+            continue
+        line = f"- {truncate_tokens(title, 60)}"
+        cost = estimate_tokens(line) + 1
+        if cost > remaining:
+            break
+        seen.add(title.lower())
+        lines.append(line)
+        remaining -= cost
+    return header + "\n" + "\n".join(lines)
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.4,
-    )
-    return resp.choices[0].message.content.strip()
 
+def select_comments(comments: Sequence[CommentRecord], budget: int) -> List[str]:
+    """
+    Highest-scored comments first, each capped at MAX_COMMENT_TOKENS, until the
+    budget runs out. Deleted and near-empty comments are dropped.
+    """
+    picked = []
+    for c in sorted(comments, key=lambda c: c.score, reverse=True):
+        body = " ".join((c.body or "").split())
+        if body in SKIP_COMMENTS or len(body.split()) < MIN_COMMENT_WORDS:
+            continue
+        body = truncate_tokens(body, MAX_COMMENT_TOKENS)
+        cost = estimate_tokens(body) + 2
+        if cost > budget:
+            continue
+        picked.append(body)
+        budget -= cost
+        if len(picked) >= MAX_POST_COMMENTS:
+            break
+    return picked
 
-def summarize_post(title: str, comments: list[str] | None = None) -> str:
-    if not client:
-        return title
-
-    comment_block = ""
-    if comments:
-        comment_block = "\n\nTop comments:\n" + "\n".join([f"- {c}" for c in comments[:6]])
 
+def build_post_prompt(title: str, comments: Sequence[CommentRecord] | None = None, budget: int = POST_PROMPT_BUDGET) -> str:
     prompt = f"""
 You are summarizing a Reddit conversation for a dashboard list.
 Use the title and comments to create a concise, plain-language summary in one sentence (max 18 words).
 Avoid quotes, numbering, and hashtags.
 
 Title:
-{title}
-{comment_block}
+{truncate_tokens(title, 80)}
 """.strip()
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
+    picked = select_comments(comments or [], budget - estimate_tokens(prompt) - 5)
+    if picked:
+        prompt += "\n\nTop comments:\n" + "\n".join([f"- {c}" for c in picked])
+    return prompt
+
+
+def _complete(
+    kind: str,
+    category: str,
+    prompt: str,
+    temperature: float,
+    usage: Optional[list],
+) -> str:
+    start = time.perf_counter()
+    resp = breaker("openai").call(
+        get_client().chat.completions.create,
+        model=MODEL,
         messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
+        temperature=temperature,
     )
+    if usage is not None:
+        tokens = resp.usage
+        usage.append(
+            UsageRecord(
+                kind=kind,
+                category=category,
+                model=MODEL,
+                prompt_tokens=tokens.prompt_tokens if tokens else estimate_tokens(prompt),
+                completion_tokens=tokens.completion_tokens if tokens else 0,
+                latency_ms=(time.perf_counter() - start) * 1000,
+            )
+        )
     return resp.choices[0].message.content.strip()
+
+
+def summarize_category(category: str, titles: list[str], usage: Optional[list] = None) -> str:
+    if not get_client():
+        return "OpenAI key not configured."
+
+    prompt = build_category_prompt(category, titles)
+    return _complete("category", category, prompt, 0.4, usage)
+
+
+def summarize_post(
+    title: str,
+    comments: list[CommentRecord] | None = None,
+    category: str = "",
+    usage: Optional[list] = None,
+) -> str:
+    if not get_client():
+        return title
+
+    prompt = build_post_prompt(title, comments)
+    return _complete("post", category, prompt, 0.3, usage)
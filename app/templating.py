@@ -0,0 +1,77 @@
+"""
+Template environment shared by the web app and the worker, plus static asset URLs.
+"""
+import hashlib
+import os
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+from .settings import settings
+
+TEMPLATE_DIR = "app/templates"
+STATIC_DIR = "app/static"
+FINGERPRINT_CHARS = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+templates = Jinja2Templates(directory=TEMPLATE_DIR)
+env = templates.env
+# Compiled templates survive restarts, so a fresh process skips parsing
+os.makedirs(settings.jinja_cache_dir, exist_ok=True)
+env.bytecode_cache = FileSystemBytecodeCache(settings.jinja_cache_dir)
+
+
+@lru_cache(maxsize=None)
+def _file_fingerprint(path: str, mtime_ns: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:FINGERPRINT_CHARS]
+
+
+def fingerprint(name: str) -> str:
+    path = os.path.join(STATIC_DIR, name)
+    try:
+        return _file_fingerprint(path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return ""
+
+
+def static_url(name: str) -> str:
+    """
+    /static URL carrying the file's content hash; a new deploy changes the URL,
+    so the old one can be cached forever.
+    """
+    version = fingerprint(name)
+    return f"/static/{name}?v={version}" if version else f"/static/{name}"
+
+
+env.globals["static_url"] = static_url
+
+
+@lru_cache(maxsize=1024)
+def fragment(name: str, **ctx) -> Markup:
+    """
+    Renders a template that depends only on its (hashable) arguments, once per
+    process. For the static parts of pages, e.g. the topic pills.
+    """
+    return Markup(env.get_template(name).render(**ctx))
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles that marks fingerprinted requests (?v=<current hash>) immutable.
+    Anything else is revalidated, so a stale hash can't pin an old file.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        version = parse_qs(scope.get("query_string", b"").decode()).get("v", [""])[0]
+        name = os.path.relpath(full_path, STATIC_DIR)
+        if version and version == fingerprint(name):
+            response.headers["Cache-Control"] = IMMUTABLE
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
@@ -0,0 +1,197 @@
+TOPIC_CHOICES = [
+    "ai",
+    "art",
+    "books",
+    "business",
+    "careers",
+    "climate",
+    "coding",
+    "cooking",
+    "crypto",
+    "culture",
+    "design",
+    "economics",
+    "education",
+    "energy",
+    "entrepreneurship",
+    "fashion",
+    "finance",
+    "fitness",
+    "food",
+    "gaming",
+    "health",
+    "history",
+    "investing",
+    "law",
+    "marketing",
+    "medicine",
+    "movies",
+    "music",
+    "parenting",
+    "personal finance",
+    "philosophy",
+    "photography",
+    "politics",
+    "productivity",
+    "real estate",
+    "relationships",
+    "science",
+    "sports",
+    "startups",
+    "sustainability",
+    "technology",
+    "travel",
+    "venture capital",
+    "wellness",
+    "world news",
+    "youth culture",
+    "cars",
+    "space",
+    "cybersecurity",
+    "data science",
+    "robotics",
+    "blockchain",
+    "economy",
+    "leadership",
+    "remote work",
+    "ecommerce",
+    "ux",
+    "architecture",
+    "biology",
+    "chemistry",
+    "physics",
+    "psychology",
+    "sociology",
+    "podcasts",
+    "startups funding",
+    "strategy",
+    "fundraising",
+    "management",
+    "sales",
+    "security",
+    "privacy",
+    "hardware",
+    "mobile",
+    "cloud",
+    "devops",
+    "open source",
+    "artificial intelligence",
+    "machine learning",
+    "product management",
+    "fintech",
+    "banking",
+    "insurance",
+    "retail",
+    "supply chain",
+    "logistics",
+    "manufacturing",
+    "energy transition",
+    "renewables",
+    "agriculture",
+    "environment",
+    "nonprofits",
+    "global affairs",
+    "geopolitics",
+    "econometric",
+    "public policy",
+    "journalism",
+    "media",
+    "social media",
+    "culture wars",
+    "space exploration",
+    "astronomy",
+    "mathematics",
+    "linguistics",
+    "language learning",
+    "career switching",
+    "investor relations",
+    "board governance",
+    "corporate strategy",
+    "consumer tech",
+    "enterprise tech",
+    "biotech",
+    "pharma",
+    "mental health",
+    "nutrition",
+    "restaurants",
+    "recipes",
+    "home improvement",
+    "interior design",
+    "gardening",
+    "outdoors",
+    "camping",
+    "hiking",
+    "running",
+    "cycling",
+    "soccer",
+    "basketball",
+    "baseball",
+    "football",
+    "tennis",
+    "golf",
+    "esports",
+    "board games",
+    "comics",
+    "anime",
+    "education policy",
+    "student life",
+    "hr",
+    "recruiting",
+    "legal tech",
+    "climate tech",
+    "robotics startups",
+    "quant finance",
+]
+
+# Extra phrases that signal a topic. Topic names themselves always match;
+# a phrase may point at several topics.
+TOPIC_SYNONYMS = {
+    "ai": ["llm", "llms", "chatgpt", "openai", "gpt", "generative ai", "neural network"],
+    "artificial intelligence": ["llm", "chatgpt", "generative ai"],
+    "machine learning": ["deep learning", "neural network", "ml model", "pytorch", "tensorflow"],
+    "books": ["novel", "reading list"],
+    "careers": ["job offer", "interview", "resume", "internship", "recruiter", "promotion", "layoff"],
+    "career switching": ["career change", "bootcamp"],
+    "climate": ["global warming", "emissions", "carbon"],
+    "coding": ["python", "javascript", "typescript", "java", "react", "fastapi", "docker", "kubernetes", "programming", "developer"],
+    "cooking": ["recipe", "baking", "kitchen"],
+    "crypto": ["bitcoin", "ethereum", "btc", "eth", "defi", "nft"],
+    "blockchain": ["ethereum", "smart contract", "web3"],
+    "cybersecurity": ["ransomware", "malware", "phishing", "data breach", "vulnerability"],
+    "economics": ["inflation", "recession", "gdp", "interest rates"],
+    "economy": ["inflation", "recession", "gdp", "unemployment", "interest rates"],
+    "entrepreneurship": ["founder", "bootstrapped", "side hustle"],
+    "finance": ["stock", "stocks", "earnings", "bonds", "stock market"],
+    "fitness": ["workout", "gym", "strength training", "weightlifting"],
+    "food": ["recipe", "diet", "restaurant", "meal"],
+    "gaming": ["video game", "playstation", "xbox", "nintendo", "steam"],
+    "health": ["doctor", "symptoms", "diagnosis"],
+    "investing": ["stock", "stocks", "etf", "index fund", "portfolio", "dividend", "options trading"],
+    "movies": ["film", "cinema", "box office"],
+    "music": ["album", "song", "concert"],
+    "personal finance": ["budget", "budgeting", "savings", "401k", "credit card", "debt", "mortgage"],
+    "politics": ["election", "congress", "senate", "president", "democrats", "republicans"],
+    "real estate": ["housing market", "mortgage", "landlord", "renting"],
+    "remote work": ["work from home", "wfh", "hybrid work"],
+    "space": ["nasa", "spacex", "rocket", "mars", "satellite"],
+    "startups": ["startup", "saas", "mrr", "churn", "founder", "yc", "y combinator", "seed round"],
+    "startups funding": ["seed round", "series a", "pre-seed"],
+    "venture capital": ["vc", "series a", "term sheet"],
+    "fundraising": ["seed round", "series a", "term sheet"],
+    "nutrition": ["diet", "protein", "calories"],
+    "mental health": ["anxiety", "depression", "therapy", "burnout"],
+    "world news": ["breaking news"],
+    "geopolitics": ["nato", "sanctions"],
+}
+
+# Tweets matching none of a multi-topic search are filed here
+MIXED_CATEGORY = "mixed"
+
+
+def x_search_query(topics) -> str:
+    """
+    One X recent-search query covering every topic; multi-word topics are
+    quoted so they match as phrases.
+    """
+    terms = [t.strip().lower() for t in topics if t.strip()]
+    return " OR ".join(f'"{t}"' if " " in t else t for t in terms)
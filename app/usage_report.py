@@ -0,0 +1,103 @@
+"""
+Cost/latency report for LLM calls made during ingest.
+
+    python -m app.usage_report            # latest ingest (every topic queued with it)
+    python -m app.usage_report <run_id>
+    python -m app.usage_report all
+"""
+import sys
+from collections import defaultdict
+from typing import List, Optional
+
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import IngestRun, LLMUsage
+from .summarizer import COMPLETION_PRICE_PER_M, PROMPT_PRICE_PER_M
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def cost_usd(row: LLMUsage) -> float:
+    return (
+        row.prompt_tokens * PROMPT_PRICE_PER_M + row.completion_tokens * COMPLETION_PRICE_PER_M
+    ) / 1_000_000
+
+
+def _summary_line(label: str, rows: List[LLMUsage]) -> str:
+    latency = [r.latency_ms for r in rows]
+    prompt = [r.prompt_tokens for r in rows]
+    cost = [cost_usd(r) for r in rows]
+    return (
+        f"{label:<24}{len(rows):>6}{sum(prompt):>10}{sum(r.completion_tokens for r in rows):>8}"
+        f"{percentile(prompt, 50):>8.0f}{percentile(prompt, 95):>8.0f}"
+        f"{percentile(latency, 50):>9.0f}{percentile(latency, 95):>9.0f}{max(latency):>9.0f}"
+        f"{sum(cost):>10.4f}{percentile(cost, 95):>10.5f}"
+    )
+
+
+def usage_report(session: Session, run_id: Optional[int] = None, all_runs: bool = False) -> str:
+    query = select(LLMUsage)
+    if all_runs:
+        title = "all runs"
+    elif run_id is not None:
+        query = query.where(LLMUsage.run_id == run_id)
+        title = f"ingest run {run_id}"
+    else:
+        # Topics run as separate jobs; the latest ingest is every run of the latest batch
+        run = session.exec(select(IngestRun).order_by(IngestRun.id.desc())).first()
+        if not run:
+            return "No ingest runs recorded."
+        runs = [run]
+        if run.batch_id:
+            runs = session.exec(
+                select(IngestRun).where(IngestRun.batch_id == run.batch_id).order_by(IngestRun.id)
+            ).all()
+        query = query.where(LLMUsage.run_id.in_([r.id for r in runs]))
+        title = f"latest ingest ({', '.join(r.topics for r in runs)}; runs {', '.join(str(r.id) for r in runs)})"
+        finished = [r.finished_at for r in runs if r.finished_at]
+        if len(finished) == len(runs):
+            elapsed = (max(finished) - min(r.started_at for r in runs)).total_seconds()
+            title += f", {elapsed:.1f}s wall"
+    rows = session.exec(query).all()
+    if not rows:
+        return f"No LLM calls recorded for {title}."
+
+    header = (
+        f"{'':<24}{'calls':>6}{'prompt':>10}{'compl':>8}{'p50 tok':>8}{'p95 tok':>8}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'cost $':>10}{'p95 $':>10}"
+    )
+    lines = [f"LLM usage for {title}", header]
+
+    by_kind = defaultdict(list)
+    by_category = defaultdict(list)
+    for r in rows:
+        by_kind[r.kind].append(r)
+        by_category[r.category].append(r)
+
+    lines.append(_summary_line("total", rows))
+    for kind in sorted(by_kind):
+        lines.append(_summary_line(f"kind={kind}", by_kind[kind]))
+    for category in sorted(by_category, key=lambda c: -sum(cost_usd(r) for r in by_category[c])):
+        lines.append(_summary_line(f"  {category}"[:24], by_category[category]))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    arg = sys.argv[1] if len(sys.argv) > 1 else None
+    with Session(engine) as session:
+        print(
+            usage_report(
+                session,
+                run_id=int(arg) if arg and arg.isdigit() else None,
+                all_runs=arg == "all",
+            )
+        )
@@ -0,0 +1,174 @@
+"""
+Ingest worker: claims queued jobs from the IngestJob table (per-topic ingests
+and each batch's combined X search) and runs them, and applies stored Stripe
+webhook events between jobs.
+
+    python -m app.worker            # run until SIGINT/SIGTERM
+    python -m app.worker --once     # drain the queue, then exit
+
+Run as many as you like, on as many nodes as share the database; the lease
+protocol in app/jobs.py keeps them from running the same topic twice.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+
+from sqlmodel import Session
+
+from .db import configure_sqlite, engine, init_db
+from .ingest_pipeline import IngestCancelled
+from .ingest_service import ingest_topic, ingest_x_search
+from .maintenance import format_run, maybe_run_maintenance
+from .jobs import (
+    HEARTBEAT_SECONDS,
+    X_SEARCH,
+    batch_x_status,
+    claim_next,
+    fail_job,
+    finish_job,
+    job_active,
+    renew_lease,
+)
+from .models import IngestJob
+from .search import init_search_index
+from .stripe_billing import process_events
+
+POLL_SECONDS = 5.0
+
+log = logging.getLogger("theangle.worker")
+
+
+class LeaseKeeper(threading.Thread):
+    """
+    Renews a job's lease from its own thread, so a long blocking call in the
+    ingest (an LLM request, say) can't starve the heartbeat.
+    """
+
+    def __init__(self, job_id: int, worker_id: str, on_lost):
+        super().__init__(name=f"lease-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.on_lost = on_lost
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(HEARTBEAT_SECONDS):
+            try:
+                renewed = renew_lease(self.job_id, self.worker_id)
+            except Exception:
+                # Database hiccup; the lease has slack for the next beat
+                log.exception("heartbeat failed for job %s", self.job_id)
+                continue
+            if not renewed:
+                self.on_lost()
+                return
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+async def _ingest(job: IngestJob, worker_id: str) -> str:
+    def still_wanted() -> bool:
+        return job_active(job.id, worker_id)
+
+    with Session(engine) as session:
+        if job.kind == X_SEARCH:
+            return await ingest_x_search(session, job.topic.split(","), still_wanted=still_wanted)
+        x_status = batch_x_status(session, job.batch_id)
+        return await ingest_topic(
+            session, job.topic, batch_id=job.batch_id, x_status=x_status, still_wanted=still_wanted
+        )
+
+
+async def process(job: IngestJob, worker_id: str) -> None:
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(_ingest(job, worker_id))
+    lost = threading.Event()
+
+    def on_lost():
+        lost.set()
+        loop.call_soon_threadsafe(task.cancel)
+
+    keeper = LeaseKeeper(job.id, worker_id, on_lost)
+    keeper.start()
+    try:
+        message = await task
+    except asyncio.CancelledError:
+        if not lost.is_set():
+            raise
+        # Another worker owns the job now; leave it to them
+        log.warning("lost lease on job %s (%s)", job.id, job.topic)
+        return
+    except IngestCancelled:
+        # Cancelled (topic removed) or taken over; either way not ours to finish
+        log.info("job %s (%s) cancelled", job.id, job.topic)
+        return
+    except Exception as exc:
+        log.exception("job %s (%s) failed", job.id, job.topic)
+        fail_job(job.id, worker_id, f"{type(exc).__name__}: {exc}")
+        return
+    finally:
+        keeper.stop()
+
+    if finish_job(job.id, worker_id, message):
+        log.info("job %s (%s): %s", job.id, job.topic, message)
+    else:
+        log.warning("job %s (%s) finished after its lease expired", job.id, job.topic)
+
+
+async def work(worker_id: str, once: bool = False, poll: float = POLL_SECONDS) -> None:
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            # Finish the current job, then exit
+            loop.add_signal_handler(sig, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    log.info("worker %s started", worker_id)
+    while not stopping.is_set():
+        # Subscription changes are quick; don't leave them waiting behind the ingest queue
+        handled = process_events()
+        if handled:
+            log.info("applied %s billing event(s)", handled)
+        job = claim_next(worker_id)
+        if job is None:
+            if once:
+                break
+            # Idle: a good moment for the daily off-peak maintenance
+            run = maybe_run_maintenance()
+            if run:
+                log.info("maintenance: %s", format_run(run))
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=poll)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        log.info("claimed job %s (%s), attempt %s", job.id, job.topic, job.attempts)
+        await process(job, worker_id)
+    log.info("worker %s stopped", worker_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="The Angle ingest worker")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between queue checks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    init_db()
+    init_search_index()
+    configure_sqlite()
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    asyncio.run(work(worker_id, once=args.once, poll=args.poll))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Micro-benchmark: parse 100 Reddit listing pages into ingest records.
+
+Compares the old path (stdlib json + one dict per post) with the current one
+(records.loads + PostRecord), reporting wall time and memory held by the parsed
+posts. Both paths get a warmup pass, then alternate which goes first over
+`runs` rounds; the best and median times are shown.
+
+    python bench/ingest_parse.py [pages] [runs]
+"""
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.ingest_reddit import _listing_posts, looks_like_question  # noqa: E402
+from app.records import loads  # noqa: E402
+
+POSTS_PER_PAGE = 100
+
+
+def make_page(page: int) -> bytes:
+    children = []
+    for i in range(POSTS_PER_PAGE):
+        children.append({
+            "kind": "t3",
+            "data": {
+                "id": f"p{page}_{i}",
+                "title": f"How do people handle problem {page}-{i}?",
+                "is_self": i % 3 != 0,
+                "stickied": False,
+                "permalink": f"/r/sample/comments/p{page}_{i}/title/",
+                "author": f"user{i}",
+                "created_utc": 1700000000.0 + i,
+                "score": i * 7,
+                "num_comments": i * 3,
+                # Representative of the fields we never read
+                "selftext": "lorem ipsum " * 120,
+                "selftext_html": "<p>" + "lorem ipsum " * 120 + "</p>",
+                "preview": {"images": [{"source": {"url": "https://i.redd.it/x.jpg"}, "resolutions": [{"w": w} for w in range(8)]}]},
+                "all_awardings": [{"name": "award", "description": "x" * 80} for _ in range(4)],
+                "link_flair_richtext": [{"e": "text", "t": "flair"}],
+                "subreddit_name_prefixed": "r/sample",
+            },
+        })
+    return json.dumps({"kind": "Listing", "data": {"after": f"t3_{page}", "children": children}}).encode()
+
+
+def dict_path(pages):
+    out = []
+    for raw in pages:
+        data = json.loads(raw)
+        for c in data.get("data", {}).get("children", []):
+            d = c.get("data", {})
+            title = d.get("title") or ""
+            if not d.get("is_self") and not looks_like_question(title):
+                continue
+            out.append({
+                "source": "reddit",
+                "source_id": d.get("id"),
+                "title": title,
+                "url": "https://www.reddit.com" + (d.get("permalink") or ""),
+                "author": d.get("author"),
+                "created_utc": int(d.get("created_utc") or 0),
+                "score": int(d.get("score") or 0),
+                "num_comments": int(d.get("num_comments") or 0),
+            })
+    return out
+
+
+def record_path(pages):
+    out = []
+    for raw in pages:
+        out.extend(_listing_posts(loads(raw), conversations_only=True))
+    return out
+
+
+PATHS = (("dict", dict_path), ("record", record_path))
+
+
+def timings(pages, runs: int):
+    times = {name: [] for name, _ in PATHS}
+    for _, fn in PATHS:
+        fn(pages)  # warmup
+    for i in range(runs):
+        # Alternate the order so neither path always runs on a warmer heap
+        for name, fn in PATHS if i % 2 == 0 else PATHS[::-1]:
+            start = time.perf_counter()
+            fn(pages)
+            times[name].append(time.perf_counter() - start)
+    return times
+
+
+def memory(fn, pages):
+    tracemalloc.start()
+    result = fn(pages)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained, peak, len(result)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    pages = [make_page(i) for i in range(n)]
+    total_mb = sum(len(p) for p in pages) / 1e6
+    print(f"{n} pages, {n * POSTS_PER_PAGE} posts, {total_mb:.1f} MB of JSON, {runs} runs")
+    print(f"{'path':<10}{'best':>10}{'median':>10}{'pages/s':>10}{'retained':>12}{'peak':>12}{'posts':>8}")
+    times = timings(pages, runs)
+    for name, fn in PATHS:
+        best, median = min(times[name]), statistics.median(times[name])
+        retained, peak, count = memory(fn, pages)
+        print(
+            f"{name:<10}{best * 1000:>8.1f}ms{median * 1000:>8.1f}ms{n / median:>10.0f}"
+            f"{retained / 1e6:>10.2f}MB{peak / 1e6:>10.2f}MB{count:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
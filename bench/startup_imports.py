@@ -0,0 +1,71 @@
+"""
+Cold-start import cost of the web app and the worker, from `python -X importtime`.
+
+Each entry point is imported in a fresh interpreter a few times; the report
+shows the median total, the slowest top-level packages, and whether the heavy
+optional clients (openai, stripe, numpy) were pulled in at import.
+
+    python bench/startup_imports.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+ENTRY_POINTS = {"web": "app.main", "worker": "app.worker"}
+HEAVY = ("openai", "stripe", "numpy")
+TOP = 8
+
+
+def import_times(module: str) -> tuple[float, dict]:
+    """
+    One cold import: total milliseconds, and cumulative milliseconds per
+    top-level package (counted at its outermost import only).
+    """
+    env = dict(os.environ, APP_SECRET=os.environ.get("APP_SECRET", "bench"))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        lines.append((depth, name.strip().split(".")[0], int(cumulative) / 1000))
+
+    total = sum(ms for depth, _, ms in lines if depth == 0)
+    packages = defaultdict(float)
+    # importtime prints children before their parent; walk it parent-first
+    stack = []
+    for depth, package, ms in reversed(lines):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        if package not in {p for _, p in stack}:
+            packages[package] += ms
+        stack.append((depth, package))
+    return total, packages
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for label, module in ENTRY_POINTS.items():
+        samples = [import_times(module) for _ in range(runs)]
+        totals = [total for total, _ in samples]
+        last = samples[-1][1]
+        print(f"{label} ({module}): median {statistics.median(totals):.0f} ms over {runs} runs")
+        for name, ms in sorted(last.items(), key=lambda kv: -kv[1])[:TOP]:
+            print(f"  {name:<20}{ms:>8.1f} ms")
+        loaded = [name for name in HEAVY if name in last]
+        print(f"  heavy modules at import: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
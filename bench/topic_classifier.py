@@ -0,0 +1,97 @@
+"""
+Throughput benchmark: compiled TopicClassifier vs naive_category, the keyword
+bucketing the app used before it.
+
+naive_category only knows five hard-coded buckets and returns one of them;
+the classifier matches all TOPIC_CHOICES plus synonyms and returns every hit.
+"naive, all topics" extends naive_category's `in` scans to the same terms the
+classifier covers, for a like-for-like comparison.
+
+    python bench/topic_classifier.py [titles]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("APP_SECRET", "bench")
+
+from app.classifier import DEFAULT_CLASSIFIER, TopicClassifier  # noqa: E402
+from app.topics import TOPIC_CHOICES, TOPIC_SYNONYMS  # noqa: E402
+
+FILLER = (
+    "anyone else think this is getting out of hand lately what would you do in my "
+    "situation honestly asking for advice because i am stuck and need some perspective"
+).split()
+KEYWORDS = ["resume", "stocks", "saas founder", "python api", "recipe", "chatgpt",
+            "personal finance", "election", "bitcoin", "workout", "mortgage rates"]
+
+
+def make_titles(n: int) -> list[str]:
+    rng = random.Random(7)
+    titles = []
+    for _ in range(n):
+        words = rng.sample(FILLER, rng.randint(6, 14))
+        if rng.random() < 0.7:
+            words.insert(rng.randrange(len(words)), rng.choice(KEYWORDS))
+        titles.append(" ".join(words).capitalize() + "?")
+    return titles
+
+
+def naive_category(title: str) -> str:
+    t = (title or "").lower()
+    if any(k in t for k in ["intern", "resume", "interview", "recruit"]):
+        return "careers"
+    if any(k in t for k in ["stock", "options", "trading", "crypto", "market", "earnings"]):
+        return "markets"
+    if any(k in t for k in ["startup", "saas", "churn", "mrr", "founder", "fundraising"]):
+        return "startups"
+    if any(k in t for k in ["python", "java", "react", "fastapi", "api", "docker", "kubernetes"]):
+        return "coding"
+    if any(k in t for k in ["food", "recipe", "cooking", "nutrition", "diet"]):
+        return "food"
+    return "misc"
+
+
+def naive_all_topics(title: str) -> list[str]:
+    t = (title or "").lower()
+    return [
+        topic for topic in TOPIC_CHOICES
+        if any(k in t for k in [topic, *TOPIC_SYNONYMS.get(topic, ())])
+    ]
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    titles = make_titles(n)
+
+    start = time.perf_counter()
+    TopicClassifier(TOPIC_CHOICES)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    naive = timed(lambda: [naive_category(t) for t in titles])
+    naive_all = timed(lambda: [naive_all_topics(t) for t in titles])
+    compiled = timed(lambda: DEFAULT_CLASSIFIER.classify_many(titles))
+    matched = sum(1 for topics in DEFAULT_CLASSIFIER.classify_many(titles) if topics)
+    naive_matched = sum(1 for t in titles if naive_category(t) != "misc")
+    naive_all_matched = sum(1 for t in titles if naive_all_topics(t))
+
+    print(f"{n} titles, {len(TOPIC_CHOICES)} topics, classifier compiled in {compile_ms:.1f}ms")
+    print(f"{'function':<22}{'time':>10}{'titles/s':>12}{'matched':>10}")
+    print(f"{'naive_category':<22}{naive * 1000:>8.1f}ms{n / naive:>12.0f}{naive_matched:>10}")
+    print(f"{'naive, all topics':<22}{naive_all * 1000:>8.1f}ms{n / naive_all:>12.0f}{naive_all_matched:>10}")
+    print(f"{'TopicClassifier':<22}{compiled * 1000:>8.1f}ms{n / compiled:>12.0f}{matched:>10}")
+
+
+if __name__ == "__main__":
+    main()